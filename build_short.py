@@ -1,58 +1,325 @@
 # ruff: noqa
 
-import textwrap
+import multiprocessing
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import repeat
+
+import numpy as np
 
 try:
-    from moviepy import AudioFileClip, ImageClip, CompositeVideoClip, TextClip, concatenate_videoclips, vfx
+    from moviepy import ImageClip
 except ImportError:  # pragma: no cover - fallback for MoviePy<2.0
-    from moviepy.editor import AudioFileClip, ImageClip, CompositeVideoClip, TextClip, concatenate_videoclips, vfx
+    from moviepy.editor import ImageClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+import imageio_ffmpeg
 from PIL import Image, ImageDraw, ImageFont
 
-from utils.video_io import as_np_frame
-from utils.moviepy_compat import (
-    clip_with_audio,
-    clip_with_duration,
-)
-
 FONT = None
+# Ключ текущего шрифта для кеша кадров: ``id(FONT)`` может переиспользоваться
+# после сборки мусора, поэтому храним путь и размер.
+_FONT_KEY = None
+# Кадр 1080x1920 занимает ~6 МБ (720x1280 — ~2.7 МБ), поэтому кеш держим небольшим.
+_CAPTION_CACHE_SIZE = 32
+_CAPTION_CACHE: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+# Пул процессов окупается только на колодах из нескольких новых слайдов.
+_PARALLEL_MIN_SLIDES = 4
+# Один пул на процесс, запускаемый через spawn: assemble_short вызывают из
+# многопоточного сервера и планировщика (там же крутится поток озвучки), а
+# fork такого процесса может унести в потомка чужие захваченные блокировки.
+# Создаём лениво и переиспользуем, чтобы не платить за запуск на каждый ролик.
+_SLIDE_POOL: ProcessPoolExecutor | None = None
+_SLIDE_POOL_LOCK = threading.Lock()
+# x264 ultrafast перестаёт ускоряться после 4 потоков, а автоопределение
+# в контейнерах часто видит все ядра хоста.
+_ENCODER_THREADS = min(4, os.cpu_count() or 1)
+CAPTION_BG = (20, 20, 25)
+CAPTION_FG = (255, 255, 255)
+# Слайды для concat-демультиплексора пишем несжатым BMP: ffmpeg читает его
+# без распаковки, а PIL не тратит время на deflate, как с PNG.
+_SLIDE_FORMAT = "bmp"
+# Полупрозрачная подложка под строками подписи.
+CAPTION_BOX = (0, 0, 0)
+CAPTION_BOX_ALPHA = 140
+
+@lru_cache(maxsize=16)
+def _get_font(path: str, size: int):
+    """Загрузить TrueType-шрифт один раз на (путь, размер) и прогреть его.
+
+    ``getmask`` заранее инициализирует FreeType-face и кеш глифов, чтобы
+    первый отрисованный слайд не платил за это.
+    """
+    font = ImageFont.truetype(path, size)
+    font.getmask("A")
+    return font
+
+@lru_cache(maxsize=1)
+def _default_font():
+    """Встроенный шрифт PIL, загруженный один раз для всех fallback-веток."""
+    return ImageFont.load_default()
 
 def load_font(path: str, size: int) -> None:
-    """Загрузить пользовательский шрифт для подписей."""
-    global FONT
+    """Загрузить пользовательский шрифт для подписей.
+
+    Шрифты кешируются по ``(path, size)``, поэтому повторные вызовы из
+    долгоживущего процесса (сервер, несколько ``build_all``) не разбирают TTF
+    заново.
+    """
+    global FONT, _FONT_KEY
+    if FONT is not None and _FONT_KEY == (path, size):
+        return
     try:
-        FONT = ImageFont.truetype(path, size)
+        FONT = _get_font(path, size)
+        _FONT_KEY = (path, size)
     except Exception:
         # Fallback to default PIL font
-        FONT = ImageFont.load_default()
+        FONT = _default_font()
+        _FONT_KEY = None
 
-def caption_frame(
+def _font_for(font_path: str | None, font_size: int | None):
+    """Вернуть шрифт по пути и размеру, переиспользуя загруженный ``FONT``."""
+    if font_path is None:
+        return FONT
+    if _FONT_KEY == (font_path, font_size):
+        return FONT
+    try:
+        return _get_font(font_path, font_size)
+    except Exception:
+        return _default_font()
+
+@lru_cache(maxsize=8)
+def _wrap_pattern(max_chars: int) -> "re.Pattern[str]":
+    """Регулярка переноса: до ``max_chars`` символов до пробела или жёсткий разрыв."""
+    return re.compile(rf"\s*(?:(.{{0,{max_chars - 1}}}\S)(?:\s+|$)|(\S{{{max_chars}}}))")
+
+def _wrap_line(line: str, max_chars: int) -> list[str]:
+    """Перенести строку по словам за один проход регулярки (как ``textwrap.wrap``).
+
+    Слово длиннее ``max_chars`` начинается с новой строки и режется на куски.
+    """
+    return [match.group(1) or match.group(2) for match in _wrap_pattern(max_chars).finditer(line)]
+
+@lru_cache(maxsize=8)
+def _base_template(size: tuple[int, int], bg: tuple[int, int, int]) -> Image.Image:
+    """Залитый фоном холст; вызывающие получают его копию, а не оригинал."""
+    return Image.new("RGB", size, bg)
+
+def _render_caption_image(
     text: str,
-    size: tuple[int, int] = (1080, 1920),
-    bg: tuple[int, int, int] = (20, 20, 25),
-    fg: tuple[int, int, int] = (255, 255, 255),
-    pad: int = 40,
-):
-    """Создать кадр ``ImageClip`` с перенесённым текстом."""
-    img = Image.new("RGB", size, bg)
-    draw = ImageDraw.Draw(img)
+    size: tuple[int, int],
+    bg: tuple[int, int, int],
+    fg: tuple[int, int, int],
+    font_path: str | None = None,
+    font_size: int | None = None,
+) -> Image.Image:
+    """Отрисовать подпись в PIL-изображение.
+
+    Функция не зависит от глобального состояния вызывающего процесса,
+    поэтому её можно выполнять в пуле процессов.
+    """
+    font = _font_for(font_path, font_size) or _default_font()
+    img = _base_template(size, bg).copy()
     w, h = size
-    max_chars = 28
+    # ~38 px на символ при шрифте 64: 28 символов на 1080, 18 на 720.
+    max_chars = max(8, w // 38)
     wrapped = []
     for line in text.split("\n"):
         if not line.strip():
             wrapped.append("")
         else:
-            wrapped += textwrap.wrap(line, width=max_chars)
-    y = int(h*0.2)
+            wrapped += _wrap_line(line, max_chars)
+    top = int(h*0.2)
+    gap = 28
+    # Высота строки постоянна для шрифта: берём её из метрик один раз,
+    # а на каждую строку считаем только ширину (advance, без bbox).
+    if hasattr(font, "getmetrics"):
+        ascent, descent = font.getmetrics()
+    else:  # растровый шрифт по умолчанию без FreeType
+        ascent, descent = font.getbbox("A")[3], 0
+    line_h = ascent + descent
+    # ``multiline_text`` шагает на bbox("A") + spacing; подгоняем spacing,
+    # чтобы шаг строк был ровно line_h + gap, как у подложек.
+    spacing = line_h + gap - font.getbbox("A")[3]
+    center = w / 2
+    # caption background: прямоугольники считаем по метрикам шрифта (без
+    # растеризации), собираем в одну альфа-маску и накладываем одним вызовом.
+    rects = []
+    y = top
     for ln in wrapped:
-        bbox = draw.textbbox((0,0), ln, font=FONT)
-        tw, th = bbox[2]-bbox[0], bbox[3]-bbox[1]
-        x = (w - tw)//2
-        # caption background
-        draw.rectangle((x-14, y-10, x+tw+14, y+th+10), fill=(0,0,0,140))
-        draw.text((x, y), ln, font=FONT, fill=fg)
-        y += th + 28
-    return ImageClip(as_np_frame(img), duration=2.0)
+        if ln:
+            tw = font.getlength(ln)
+            x = int(center - tw / 2)
+            rects.append((
+                max(x - 14, 0),
+                max(y - 10, 0),
+                min(x + int(tw) + 14, w),
+                min(y + line_h + 10, h),
+            ))
+        y += line_h + gap
+    if rects:
+        band_top = min(rect[1] for rect in rects)
+        band_bottom = max(rect[3] for rect in rects)
+        alpha = np.zeros((band_bottom - band_top, w), dtype=np.uint8)
+        for x0, y0, x1, y1 in rects:
+            alpha[y0 - band_top:y1 - band_top, x0:x1] = CAPTION_BOX_ALPHA
+        img.paste(CAPTION_BOX, (0, band_top, w, band_bottom), Image.fromarray(alpha))
+    draw = ImageDraw.Draw(img)
+    draw.multiline_text(
+        (center, top),
+        "\n".join(wrapped),
+        font=font,
+        fill=fg,
+        anchor="ma",
+        spacing=spacing,
+        align="center",
+    )
+    return img
+
+def _render_caption_bytes(
+    text: str,
+    size: tuple[int, int],
+    bg: tuple[int, int, int],
+    fg: tuple[int, int, int],
+    font_path: str | None = None,
+    font_size: int | None = None,
+) -> bytes:
+    """Отрисовать подпись и вернуть сырые RGB-байты кадра."""
+    return _render_caption_image(text, size, bg, fg, font_path, font_size).tobytes()
+
+def _save_caption_slide(
+    path: str,
+    text: str,
+    size: tuple[int, int],
+    bg: tuple[int, int, int],
+    fg: tuple[int, int, int],
+    font_path: str | None = None,
+    font_size: int | None = None,
+) -> str:
+    """Отрисовать подпись прямо в файл слайда (для воркеров пула)."""
+    _render_caption_image(text, size, bg, fg, font_path, font_size).save(path)
+    return path
+
+def _frame_from_bytes(raw: bytes, size: tuple[int, int]) -> np.ndarray:
+    """Обернуть RGB-байты в массив без копирования (только для чтения)."""
+    w, h = size
+    return np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 3)
+
+def _remember_caption(key: tuple, frame: np.ndarray) -> np.ndarray:
+    _CAPTION_CACHE[key] = frame
+    _CAPTION_CACHE.move_to_end(key)
+    while len(_CAPTION_CACHE) > _CAPTION_CACHE_SIZE:
+        _CAPTION_CACHE.popitem(last=False)
+    return frame
+
+def _render_caption_rgb(
+    text: str,
+    size: tuple[int, int],
+    bg: tuple[int, int, int] = CAPTION_BG,
+    fg: tuple[int, int, int] = CAPTION_FG,
+) -> np.ndarray:
+    """Отрисовать подпись в RGB-массив только для чтения (с LRU-кешем)."""
+    key = (text, size, bg, fg, _FONT_KEY)
+    frame = _CAPTION_CACHE.get(key)
+    if frame is not None:
+        _CAPTION_CACHE.move_to_end(key)
+        return frame
+    font_path, font_size = _FONT_KEY or (None, None)
+    raw = _render_caption_bytes(text, size, bg, fg, font_path, font_size)
+    return _remember_caption(key, _frame_from_bytes(raw, size))
+
+def _write_slides(
+    lines: list[str],
+    size: tuple[int, int],
+    out_dir: str,
+    bg: tuple[int, int, int] = CAPTION_BG,
+    fg: tuple[int, int, int] = CAPTION_FG,
+    max_workers: int | None = None,
+) -> dict[str, str]:
+    """Сохранить уникальные строки в файлы слайдов и вернуть их пути.
+
+    Кадры пишутся на диск по одному сразу после отрисовки, так что в памяти
+    процесса одновременно находится не больше одного нового кадра. Новые
+    слайды длинной колоды рисуют и сохраняют воркеры общего spawn-пула;
+    ``max_workers=1`` отключает пул (по умолчанию — по числу ядер).
+    """
+    paths = {
+        line: os.path.join(out_dir, f"slide{index}.{_SLIDE_FORMAT}")
+        for index, line in enumerate(dict.fromkeys(lines))
+    }
+    pending = [line for line in paths if (line, size, bg, fg, _FONT_KEY) not in _CAPTION_CACHE]
+    written = set()
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    font_path, font_size = _FONT_KEY or (None, None)
+    if len(pending) >= _PARALLEL_MIN_SLIDES and workers > 1:
+        pool = _slide_pool()
+        try:
+            list(pool.map(
+                _save_caption_slide,
+                [paths[line] for line in pending],
+                pending,
+                repeat(size),
+                repeat(bg),
+                repeat(fg),
+                repeat(font_path),
+                repeat(font_size),
+            ))
+        except BrokenProcessPool:
+            # Воркер умер: пул выбрасываем, слайды дорисуем ниже в этом процессе.
+            _discard_slide_pool(pool)
+        else:
+            written.update(pending)
+    for line, path in paths.items():
+        if line in written:
+            continue
+        cached = _CAPTION_CACHE.get((line, size, bg, fg, _FONT_KEY))
+        if cached is not None:
+            Image.fromarray(cached).save(path)
+        else:
+            # Мимо кеша кадров: он держит до _CAPTION_CACHE_SIZE полноразмерных
+            # массивов, а слайду нужен только файл.
+            _save_caption_slide(path, line, size, bg, fg, font_path, font_size)
+    return paths
+
+def _slide_pool() -> ProcessPoolExecutor:
+    global _SLIDE_POOL
+    with _SLIDE_POOL_LOCK:
+        if _SLIDE_POOL is None:
+            _SLIDE_POOL = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _SLIDE_POOL
+
+def _discard_slide_pool(pool: ProcessPoolExecutor) -> None:
+    global _SLIDE_POOL
+    with _SLIDE_POOL_LOCK:
+        if _SLIDE_POOL is pool:
+            _SLIDE_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _segment_frames(count: int, duration: float, fps: int) -> list[int]:
+    """Разбить ``duration`` на ``count`` равных слайдов в целых кадрах."""
+    total = max(int(round(duration * fps)), count)
+    bounds = [round(total * (index + 1) / count) for index in range(count)]
+    return [max(end - start, 1) for start, end in zip([0] + bounds, bounds)]
+
+def caption_frame(
+    text: str,
+    size: tuple[int, int] = (720, 1280),
+    bg: tuple[int, int, int] = CAPTION_BG,
+    fg: tuple[int, int, int] = CAPTION_FG,
+    pad: int = 40,
+):
+    """Создать кадр ``ImageClip`` с перенесённым текстом."""
+    frame = _render_caption_rgb(text, tuple(size), tuple(bg), tuple(fg))
+    return ImageClip(frame, duration=2.0)
 
 def assemble_short(
     lines: list[str],
@@ -60,10 +327,18 @@ def assemble_short(
     title: str,
     out_path: str,
     fps: int = 30,
-    resolution: tuple[int, int] = (1080, 1920),
+    resolution: tuple[int, int] = (720, 1280),
     max_duration: float = 12.0,
-):
-    """Собрать короткое видео из слайдов и озвучки."""
+    encoder_threads: int | None = None,
+    slide_workers: int | None = None,
+) -> float:
+    """Собрать короткое видео из слайдов и озвучки.
+
+    Возвращает длительность ролика в секундах (ровно столько кадров отдаётся
+    ffmpeg), чтобы вызывающий код мог не пробовать готовый файл заново.
+    ``encoder_threads`` и ``slide_workers`` ограничивают потоки x264 и пул
+    отрисовки слайдов, когда несколько роликов собираются параллельно.
+    """
 
     prepared_lines = [str(line) for line in lines if str(line).strip()]
     if not prepared_lines:
@@ -73,49 +348,54 @@ def assemble_short(
     if safe_max_duration <= 0:
         safe_max_duration = 12.0
 
-    with AudioFileClip(audio_path) as base_audio:
-        if base_audio.duration > safe_max_duration:
-            audio_clip = base_audio.subclip(0, safe_max_duration)
-        else:
-            audio_clip = base_audio
-
-        target_duration = max(audio_clip.duration, 0.1)
-        audio_clip = clip_with_duration(audio_clip, target_duration)
-        segment_duration = target_duration / max(1, len(prepared_lines))
-
-        clips = []
-        elapsed = 0.0
-        for index, line in enumerate(prepared_lines):
-            remaining = len(prepared_lines) - index
-            if remaining <= 1:
-                duration = max(target_duration - elapsed, 0.1)
-            else:
-                duration = max(segment_duration, 0.1)
-            clip = clip_with_duration(caption_frame(line, size=resolution), duration)
-            clips.append(clip)
-            elapsed += duration
-
-        video = None
-        rendered = None
-        try:
-            video = concatenate_videoclips(clips, method="compose")
-            rendered = clip_with_audio(video, audio_clip)
-            rendered.write_videofile(
-                out_path,
-                fps=fps,
-                codec="libx264",
-                audio_codec="aac",
-                threads=1,
-            )
-        finally:
-            if rendered is not None and rendered is not video:
-                rendered.close()
-            if video is not None:
-                video.close()
-            for clip in clips:
-                clip.close()
-            if audio_clip is not base_audio:
-                audio_clip.close()
+    # Нужна только длительность: читаем заголовок, не открывая декодер.
+    audio_duration = ffmpeg_parse_infos(audio_path)["duration"]
+
+    target_duration = max(min(audio_duration, safe_max_duration), 0.1)
+    segment_frames = _segment_frames(len(prepared_lines), target_duration, fps)
+    video_duration = sum(segment_frames) / fps
+
+    # Каждый слайд — неподвижный кадр: сохраняем его один раз и отдаём
+    # ffmpeg через concat-демультиплексор, без генерации кадров в Python.
+    with tempfile.TemporaryDirectory(prefix="short-slides-") as tmp_dir:
+        # Одинаковые строки используют один и тот же файл слайда.
+        slide_paths = _write_slides(
+            prepared_lines, tuple(resolution), tmp_dir, max_workers=slide_workers
+        )
+
+        list_path = os.path.join(tmp_dir, "slides.txt")
+        entries = []
+        for line, count in zip(prepared_lines, segment_frames):
+            entries.append(f"file '{slide_paths[line]}'\nduration {count / fps:.6f}\n")
+        # concat игнорирует длительность последней записи, если файл не повторён.
+        entries.append(f"file '{slide_paths[prepared_lines[-1]]}'\n")
+        with open(list_path, "w", encoding="utf-8") as handle:
+            handle.write("".join(entries))
+
+        command = [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            # Декодируем озвучку только до конца ролика.
+            "-t", f"{video_duration:.6f}", "-i", audio_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            # Слайды статичны: stillimage ослабляет деблокинг, а кадровый
+            # параллелизм x264 быстрее слайсового.
+            "-tune", "stillimage",
+            "-threads", str(encoder_threads or _ENCODER_THREADS),
+            "-x264-params", "sliced-threads=0",
+            "-pix_fmt", "yuv420p",
+            "-r", str(fps),
+            "-c:a", "aac",
+            "-t", f"{video_duration:.6f}",
+            out_path,
+        ]
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            message = result.stderr.decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg failed to assemble {out_path}: {message}")
+    return video_duration
 
 if __name__ == "__main__":
     load_font("DejaVuSans.ttf", 64)
@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 
+# Настройки читаются один раз при импорте, поэтому берём снимок окружения
+# и дальше работаем с обычным словарём.
+_ENV_SNAPSHOT = dict(os.environ)
+
+
 def _env(name: str, default: str | None = None) -> str | None:
-    v = os.getenv(name)
+    v = _ENV_SNAPSHOT.get(name)
     if v is None or v == "":
         return default
     return v
@@ -19,14 +25,19 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
-def _env_list(name: str, default: list[str]) -> list[str]:
+def _env_list(name: str, default: tuple[str, ...]) -> tuple[str, ...]:
     raw = _env(name)
     if not raw:
-        return default
-    return [x.strip() for x in raw.split(",") if x.strip()]
+        return tuple(default)
+    return tuple(item for x in raw.split(",") if (item := x.strip()))
+
+
+@lru_cache(maxsize=4)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Typed application settings with safe defaults for Render environment."""
 
@@ -34,7 +45,7 @@ class Settings:
     AUTO_ON: bool = (_env("AUTO_ON", "true").lower() == "true")
     TIMEZONE: str = _env("TIMEZONE", "Asia/Almaty") or "Asia/Almaty"
     DAILY_SLOTS: int = _env_int("DAILY_SLOTS", 3)
-    AUTO_TIMES: list[str] = _env_list("AUTO_TIMES", ["10:05", "16:05", "21:05"])
+    AUTO_TIMES: tuple[str, ...] = _env_list("AUTO_TIMES", ("10:05", "16:05", "21:05"))
     CONTENT_PLAN_PATH: str = _env("CONTENT_PLAN_PATH", "content/cats/calendar.csv") or "content/cats/calendar.csv"
 
     # YouTube
@@ -48,7 +59,7 @@ class Settings:
     def tz(self) -> ZoneInfo:
         """Return configured timezone instance."""
 
-        return ZoneInfo(self.TIMEZONE)
+        return _zone(self.TIMEZONE)
 
 
 settings = Settings()
@@ -1,7 +1,11 @@
 """Core modules for Shorts-Bot PRO."""
 
 __all__ = [
+    "atomic_io",
     "env_compat",
     "generate",
+    "json_compat",
+    "orjson_response",
     "upload",
+    "yaml_compat",
 ]
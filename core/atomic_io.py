@@ -0,0 +1,48 @@
+"""Atomic file replacement shared by the queue, schedule and cache writers.
+
+Data is written to a uniquely named temporary file in the target directory and
+then moved over the target with :func:`os.replace`, so readers see either the
+old or the new content and a crash mid-write leaves the old file intact.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+# mkstemp создаёт файл с правами 0600; после замены файл должен получить
+# обычные права с учётом umask, как при open(..., "wb").
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_FILE_MODE = 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path: str | os.PathLike[str], data: bytes) -> None:
+    """Replace ``path`` with ``data`` atomically; missing parent directories are created.
+
+    The temporary name comes from :func:`tempfile.mkstemp`, so concurrent writers
+    (threads or processes) never share or steal each other's temporary file.
+    """
+
+    target = Path(path)
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=target.parent)
+    except FileNotFoundError:
+        # Каталог создаём только при первой записи, а не на каждом сохранении.
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.chmod(tmp, _FILE_MODE)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+__all__ = ["atomic_write_bytes"]
@@ -0,0 +1,74 @@
+"""Small persistent Bloom filter for "have we seen this key before" checks.
+
+Membership costs a fixed number of bit lookups and the whole filter is a
+bytearray (~240 KB for 100k keys at a 1e-4 false-positive rate), so it can be
+kept across runs without storing the keys themselves. False positives are
+possible (a new key may be reported as seen); false negatives are not.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import struct
+from pathlib import Path
+
+from core.atomic_io import atomic_write_bytes
+
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"BLM1"
+
+
+class BloomFilter:
+    __slots__ = ("num_bits", "num_hashes", "_bits")
+
+    def __init__(self, expected_items: int = 100_000, fp_rate: float = 1e-4) -> None:
+        num_bits = math.ceil(-expected_items * math.log(fp_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, round(self.num_bits / expected_items * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        # Двойное хеширование (Kirsch–Mitzenmacher): два 64-битных хеша из одного
+        # blake2b дают все k позиций без k отдельных хеш-функций.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str], expected_items: int = 100_000, fp_rate: float = 1e-4) -> "BloomFilter":
+        """Read a filter saved by :meth:`save`; a missing or damaged file gives an empty one."""
+
+        bloom = cls(expected_items, fp_rate)
+        try:
+            raw = Path(path).read_bytes()
+        except FileNotFoundError:
+            return bloom
+        if len(raw) < _HEADER.size:
+            return bloom
+        magic, num_bits, num_hashes = _HEADER.unpack_from(raw)
+        body = raw[_HEADER.size :]
+        if magic != _MAGIC or len(body) != (num_bits + 7) // 8 or num_hashes < 1:
+            return bloom
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom._bits = bytearray(body)
+        return bloom
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        atomic_write_bytes(path, _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes) + self._bits)
+
+
+__all__ = ["BloomFilter"]
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
-import json
 import os
+from functools import lru_cache
 from typing import Any
 
+from core import json_compat
+
 DEFAULT_AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
 DEFAULT_TOKEN_URI = "https://oauth2.googleapis.com/token"
 
@@ -26,21 +28,21 @@ def _extract_section(payload: dict[str, Any]) -> dict[str, Any]:
 
 def _load_json_from_string(raw: str, source_label: str) -> dict[str, Any]:
     try:
-        payload = json.loads(raw)
-    except json.JSONDecodeError as exc:
+        payload = json_compat.loads(raw)
+    except json_compat.JSONDecodeError as exc:
         raise OAuthConfigError(f"{source_label} содержит некорректный JSON: {exc}") from exc
     if not isinstance(payload, dict):
         raise OAuthConfigError(f"{source_label} должен быть JSON-объектом")
     return payload
 
 
-def _load_client_section() -> dict[str, Any]:
-    raw_json = os.getenv("YOUTUBE_CLIENT_SECRET_JSON", "").strip()
-    if not raw_json:
-        raise OAuthConfigError(
-            "YOUTUBE_CLIENT_SECRET_JSON не задан: вставьте client_secret.json как inline JSON"
-        )
-    section = _extract_section(_load_json_from_string(raw_json, "YOUTUBE_CLIENT_SECRET_JSON"))
+@lru_cache(maxsize=4)
+def _parse_client_section(raw_json: str) -> dict[str, Any]:
+    """Разобрать и нормализовать client_secret.json (кешируется по строке).
+
+    Результат разделяется между вызовами, поэтому наружу отдаются копии.
+    """
+    section = dict(_extract_section(_load_json_from_string(raw_json, "YOUTUBE_CLIENT_SECRET_JSON")))
     client_id = str(section.get("client_id", "")).strip()
     client_secret = str(section.get("client_secret", "")).strip()
     if not client_id or not client_secret:
@@ -55,6 +57,36 @@ def _load_client_section() -> dict[str, Any]:
     return section
 
 
+@lru_cache(maxsize=4)
+def _parse_token_payload(raw: str) -> dict[str, Any]:
+    """Разобрать YOUTUBE_TOKEN_JSON (кешируется по строке, наружу — копии)."""
+    payload = _load_json_from_string(raw, "YOUTUBE_TOKEN_JSON")
+    refresh_token = str(
+        payload.get("refresh_token") or payload.get("refreshToken") or ""
+    ).strip()
+    if not refresh_token:
+        raise OAuthConfigError("YOUTUBE_TOKEN_JSON должен содержать refresh_token")
+    return payload
+
+
+def clear_oauth_cache() -> None:
+    """Сбросить кеш разобранных OAuth JSON (например, после смены env)."""
+
+    _parse_client_section.cache_clear()
+    _parse_token_payload.cache_clear()
+
+
+def _load_client_section() -> dict[str, Any]:
+    raw_json = os.getenv("YOUTUBE_CLIENT_SECRET_JSON", "").strip()
+    if not raw_json:
+        raise OAuthConfigError(
+            "YOUTUBE_CLIENT_SECRET_JSON не задан: вставьте client_secret.json как inline JSON"
+        )
+    section = dict(_parse_client_section(raw_json))
+    section["redirect_uris"] = list(section["redirect_uris"])
+    return section
+
+
 def ensure_inline_oauth_env() -> None:
     """Validate inline OAuth JSON payloads early and log friendly errors."""
 
@@ -68,12 +100,7 @@ def load_authorized_user_info() -> dict[str, Any]:
         raise OAuthConfigError(
             "YOUTUBE_TOKEN_JSON не задан: вставьте payload из OAuth Playground с refresh_token"
         )
-    payload = _load_json_from_string(raw, "YOUTUBE_TOKEN_JSON")
-    refresh_token = str(
-        payload.get("refresh_token") or payload.get("refreshToken") or ""
-    ).strip()
-    if not refresh_token:
-        raise OAuthConfigError("YOUTUBE_TOKEN_JSON должен содержать refresh_token")
+    payload = dict(_parse_token_payload(raw))
 
     client_section = _load_client_section()
     payload["client_id"] = client_section.get("client_id")
@@ -82,6 +109,8 @@ def load_authorized_user_info() -> dict[str, Any]:
     scopes = payload.get("scopes")
     if not scopes:
         payload["scopes"] = ["https://www.googleapis.com/auth/youtube.upload"]
+    elif isinstance(scopes, list):
+        payload["scopes"] = list(scopes)
     payload.setdefault("type", "authorized_user")
     return payload
 
@@ -105,6 +134,7 @@ __all__ = [
     "DEFAULT_AUTH_URI",
     "DEFAULT_TOKEN_URI",
     "OAuthConfigError",
+    "clear_oauth_cache",
     "ensure_inline_oauth_env",
     "get_oauth_client_config",
     "load_authorized_user_info",
@@ -2,17 +2,29 @@
 
 from __future__ import annotations
 
-import json
+import math
+import multiprocessing
 import os
+import queue
 import re
+import threading
+from collections import ChainMap
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, time, timedelta
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, Iterable, Sequence
 
-import yaml
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from build_short import assemble_short, load_font
+from build_short import _ENCODER_THREADS, assemble_short, load_font
+from core import json_compat, yaml_compat
+from core.atomic_io import atomic_write_bytes
+from core.metadata import merge_tags
 from core.settings import get_settings
 from tts import synth_sync
 
@@ -21,6 +33,80 @@ OUTPUT_ROOT = Path(os.getenv("OUTPUT_ROOT_DIR", "/tmp/shorts-output"))
 AUDIO_ROOT = OUTPUT_ROOT / "audio"
 VIDEO_ROOT = OUTPUT_ROOT / "video"
 MANIFEST_PATH = OUTPUT_ROOT / "manifest.json"
+_DIRS_READY = False
+
+# Дефис тоже не буква/цифра, поэтому один проход заменяет и мусор, и серии дефисов.
+_SLUG_NONALNUM = re.compile(r"[^a-z0-9]+")
+_SENTENCE_SPLIT = re.compile(r"[.!?]")
+
+
+def _read_json_sidecar(sidecar: Path, mtime_ns: int) -> tuple[bool, Any]:
+    try:
+        if sidecar.stat().st_mtime_ns < mtime_ns:
+            return False, None
+        return True, json_compat.loads(sidecar.read_bytes())
+    except (OSError, ValueError):
+        return False, None
+
+
+def _is_plain_json(value: Any) -> bool:
+    """Check that ``value`` survives a JSON round trip unchanged."""
+
+    if value is None or isinstance(value, (str, bool, int)):
+        return True
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, list):
+        return all(_is_plain_json(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _is_plain_json(item) for key, item in value.items())
+    return False
+
+
+def _write_json_sidecar(sidecar: Path, payload: Any) -> None:
+    if not _is_plain_json(payload):
+        # Например, даты или числовые ключи YAML: такой файл всегда разбираем заново.
+        return
+    try:
+        atomic_write_bytes(sidecar, json_compat.dumps(payload))
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=32)
+def _parse_yaml_cached(path: str, mtime_ns: int, size: int) -> Any:
+    # mtime_ns и size входят в ключ кеша: изменённый файл разбирается заново.
+    use_sidecar = os.getenv("YAML_JSON_SIDECAR", "").strip() == "1"
+    sidecar = Path(f"{path}.json")
+    if use_sidecar:
+        found, payload = _read_json_sidecar(sidecar, mtime_ns)
+        if found:
+            return _freeze_top_level(payload)
+    with open(path, "r", encoding="utf-8") as stream:
+        payload = yaml_compat.safe_load(stream)
+    if use_sidecar:
+        _write_json_sidecar(sidecar, payload)
+    return _freeze_top_level(payload)
+
+
+def _freeze_top_level(payload: Any) -> Any:
+    # Кешированный разбор общий для всех вызовов: верхний уровень отдаём только
+    # на чтение, а изменения вызывающий код складывает в свой ChainMap.
+    return MappingProxyType(payload) if isinstance(payload, dict) else payload
+
+
+def _load_yaml(path: Path) -> Any:
+    """Parse ``path`` once per (path, mtime, size); returns ``None`` if it is missing.
+
+    The parsed object is shared between calls: a top-level mapping is returned as
+    a read-only ``MappingProxyType`` and nested values must be copied before mutating.
+    """
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return _parse_yaml_cached(str(path), stat.st_mtime_ns, stat.st_size)
 
 
 def _parse_resolution_env() -> tuple[int, int] | None:
@@ -79,38 +165,27 @@ def _coerce_positive_float(value: Any, default: float) -> float:
 def _slugify(value: str) -> str:
     """Produce a filesystem-safe slug from an arbitrary string."""
 
-    value = value.lower().strip()
-    value = re.sub(r"[^a-z0-9\-]+", "-", value)
-    value = re.sub(r"-+", "-", value)
-    return value.strip("-") or "topic"
+    return _SLUG_NONALNUM.sub("-", value.lower().strip()).strip("-") or "topic"
 
 
-def _load_config(cfg_path: Path) -> dict[str, Any]:
-    cfg: dict[str, Any] = {}
-    if cfg_path.exists():
-        with cfg_path.open("r", encoding="utf-8") as stream:
-            loaded = yaml.safe_load(stream) or {}
-            if isinstance(loaded, dict):
-                cfg.update(loaded)
+def _load_config(cfg_path: Path) -> ChainMap[str, Any]:
+    loaded = _load_yaml(cfg_path)
+    # Переопределения пишутся в верхний словарь, кешированный YAML не копируется.
+    cfg: ChainMap[str, Any] = ChainMap({}, loaded if isinstance(loaded, Mapping) else {})
 
     default_tags_cfg: Sequence[str] = []
     if isinstance(cfg.get("default_tags"), (list, tuple)):
-        default_tags_cfg = [str(tag).strip() for tag in cfg.get("default_tags", []) if str(tag).strip()]
+        default_tags_cfg = [cleaned for tag in cfg["default_tags"] if (cleaned := str(tag).strip())]
     elif isinstance(cfg.get("shorts_hashtags"), (list, tuple)):
         default_tags_cfg = [
-            str(tag).strip()
-            for tag in cfg.get("shorts_hashtags", [])
-            if str(tag).strip()
+            cleaned for tag in cfg["shorts_hashtags"] if (cleaned := str(tag).strip())
         ]
 
     env_default_tags = list(SETTINGS.channel_default_tags)
 
-    merged_defaults: list[str] = []
-    for tag in list(default_tags_cfg) + env_default_tags:
-        if tag and tag not in merged_defaults:
-            merged_defaults.append(tag)
-
-    cfg["default_tags"] = merged_defaults
+    cfg["default_tags"] = list(
+        dict.fromkeys(tag for tag in chain(default_tags_cfg, env_default_tags) if tag)
+    )
     cfg.setdefault("tts_lang", "ru")
     cfg.setdefault("tts_timeout", 30)
 
@@ -140,8 +215,8 @@ def _load_config(cfg_path: Path) -> dict[str, Any]:
     cfg.setdefault("font_size", 64)
 
     uploader = cfg.get("uploader")
-    if not isinstance(uploader, dict):
-        uploader = {}
+    # Копия: исходный словарь принадлежит кешу разобранного YAML.
+    uploader = dict(uploader) if isinstance(uploader, dict) else {}
     uploader.setdefault("auto_schedule_if_missing", False)
     uploader.setdefault("time_local", "21:00")
     uploader.setdefault("timezone", SETTINGS.tz_target)
@@ -151,30 +226,31 @@ def _load_config(cfg_path: Path) -> dict[str, Any]:
 
 
 def _load_topics(topics_path: Path) -> list[dict[str, Any]]:
-    if not topics_path.exists():
-        return []
-    with topics_path.open("r", encoding="utf-8") as stream:
-        data = yaml.safe_load(stream) or []
-    if isinstance(data, dict):
+    data = _load_yaml(topics_path) or []
+    if isinstance(data, Mapping):
         topics = data.get("topics", [])
     else:
         topics = data
+    return _normalise_topics(topics)
+
+
+def _normalise_topics(topics: Iterable[Any]) -> list[dict[str, Any]]:
     result: list[dict[str, Any]] = []
     for raw in topics:
-        if isinstance(raw, dict):
+        if isinstance(raw, Mapping):
             title = str(raw.get("title", "")).strip()
             if not title:
                 continue
             lines = raw.get("lines") or []
             if isinstance(lines, str):
-                prepared_lines = [segment.strip() for segment in lines.split("\n") if segment.strip()]
+                prepared_lines = [cleaned for segment in lines.split("\n") if (cleaned := segment.strip())]
             else:
-                prepared_lines = [str(segment).strip() for segment in lines if str(segment).strip()]
+                prepared_lines = [cleaned for segment in lines if (cleaned := str(segment).strip())]
             result.append(
                 {
                     "title": title,
                     "lines": prepared_lines,
-                    "tags": [str(tag).strip() for tag in raw.get("tags", []) if str(tag).strip()],
+                    "tags": [cleaned for tag in raw.get("tags", []) if (cleaned := str(tag).strip())],
                     "bg_video_path": raw.get("bg_video_path"),
                     "bg_image_path": raw.get("bg_image_path"),
                     "music_path": raw.get("music_path"),
@@ -185,26 +261,21 @@ def _load_topics(topics_path: Path) -> list[dict[str, Any]]:
 
 
 def _ensure_directories() -> None:
+    global _DIRS_READY
+    # После первого успешного создания хватает одной проверки вместо трёх mkdir;
+    # если каталог вывода удалили между запусками, создаём его заново.
+    if _DIRS_READY and VIDEO_ROOT.is_dir() and AUDIO_ROOT.is_dir():
+        return
     AUDIO_ROOT.mkdir(parents=True, exist_ok=True)
     VIDEO_ROOT.mkdir(parents=True, exist_ok=True)
-    OUTPUT_ROOT.mkdir(parents=True, exist_ok=True)
+    _DIRS_READY = True
 
 
 def _ensure_lines(lines: Iterable[str], title: str) -> list[str]:
-    prepared = [line.strip() for line in lines if line.strip()]
+    prepared = [cleaned for line in lines if (cleaned := line.strip())]
     if prepared:
         return prepared
-    return [segment.strip() for segment in re.split(r"[.!?]", title) if segment.strip()]
-
-
-def _merge_tags(topic_tags: Iterable[str], default_tags: Iterable[str]) -> list[str]:
-    merged: list[str] = []
-    for source in (topic_tags, default_tags):
-        for tag in source:
-            normalized = str(tag).strip()
-            if normalized and normalized not in merged:
-                merged.append(normalized)
-    return merged
+    return [cleaned for segment in _SENTENCE_SPLIT.split(title) if (cleaned := segment.strip())]
 
 
 def _parse_time_local(raw: str) -> time:
@@ -228,19 +299,39 @@ def _load_timezone(name: str) -> ZoneInfo:
         raise RuntimeError(f"Не найдена таймзона '{name}'") from exc
 
 
-def _schedule_requires_timezone(value: str) -> bool:
+@dataclass(slots=True)
+class _ScheduleInfo:
+    """Schedule of a topic parsed once before rendering."""
+
+    raw: str | None
+    parsed: datetime | None
+    needs_tz: bool
+
+
+@lru_cache(maxsize=256)
+def _parse_iso(raw: str) -> datetime | None:
+    # datetime неизменяемый, так что результат безопасно отдавать из кеша;
+    # некорректные строки тоже кешируются (как None), без повторного raise.
     try:
-        schedule_dt = datetime.fromisoformat(value)
+        return datetime.fromisoformat(raw)
     except ValueError:
-        return True
-    return schedule_dt.tzinfo is None
+        return None
 
 
-def _normalise_schedule(value: str, default_tz: ZoneInfo | None) -> str:
-    try:
-        schedule_dt = datetime.fromisoformat(value)
-    except ValueError as exc:
-        raise RuntimeError(f"Некорректный формат schedule: {value}") from exc
+def _prep_schedule(value: Any) -> _ScheduleInfo:
+    if not isinstance(value, str) or not value.strip():
+        return _ScheduleInfo(raw=None, parsed=None, needs_tz=False)
+    raw = value.strip()
+    parsed = _parse_iso(raw)
+    # Для некорректной строки таймзону всё равно грузим, как и раньше;
+    # ошибку формата сообщит _normalise_schedule.
+    return _ScheduleInfo(raw=raw, parsed=parsed, needs_tz=parsed is None or parsed.tzinfo is None)
+
+
+def _normalise_schedule(info: _ScheduleInfo, default_tz: ZoneInfo | None) -> str:
+    schedule_dt = info.parsed
+    if schedule_dt is None:
+        raise RuntimeError(f"Некорректный формат schedule: {info.raw}")
     if schedule_dt.tzinfo is None:
         if default_tz is None:
             raise RuntimeError("Для schedule без таймзоны необходимо настроить uploader.timezone")
@@ -277,30 +368,148 @@ def _select_topics(
             raise ValueError("No matching topics for provided title")
         return matched
 
+    # Индекс по заголовку строим один раз; setdefault оставляет первую тему
+    # с таким заголовком, как и прежний линейный поиск.
+    by_title: dict[str, dict[str, Any]] = {}
+    for topic in topics:
+        by_title.setdefault(str(topic.get("title", "")).strip().lower(), topic)
+
     resolved: list[dict[str, Any]] = []
+    seen_ids: set[int] = set()
     for selector in selection:
         if isinstance(selector, int):
-            if 0 <= selector < len(topics):
-                candidate = topics[selector]
-                if candidate not in resolved:
-                    resolved.append(candidate)
+            match = topics[selector] if 0 <= selector < len(topics) else None
         else:
-            normalized = str(selector).strip().lower()
-            match = next(
-                (
-                    topic
-                    for topic in topics
-                    if str(topic.get("title", "")).strip().lower() == normalized
-                ),
-                None,
-            )
-            if match and match not in resolved:
-                resolved.append(match)
+            match = by_title.get(str(selector).strip().lower())
+        if match and id(match) not in seen_ids:
+            seen_ids.add(id(match))
+            resolved.append(match)
     if not resolved:
         raise ValueError("No matching topics found for the provided selection")
     return resolved
 
 
+def _write_manifest(payload: dict[str, Any]) -> bool:
+    """Write the manifest unless its content is unchanged; return whether it was written.
+
+    The existing file is compared byte for byte with the new payload, so an
+    identical rebuild leaves the manifest (and its mtime) untouched.
+    """
+
+    data = json_compat.dumps(payload, indent=True)
+    try:
+        if MANIFEST_PATH.stat().st_size == len(data) and MANIFEST_PATH.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    MANIFEST_PATH.write_bytes(data)
+    return True
+
+
+def _synthesise_topic(job: dict[str, Any]) -> None:
+    options = job["options"]
+    synth_sync(
+        job["script_text"],
+        job["audio_path"],
+        lang=options["tts_lang"],
+        timeout=options["tts_timeout"],
+    )
+
+
+def _assemble_topic(job: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    options = job["options"]
+    width, height = options["resolution"]
+    duration = assemble_short(
+        job["lines"],
+        job["audio_path"],
+        job["title"],
+        job["video_path"],
+        fps=options["fps"],
+        resolution=options["resolution"],
+        max_duration=options["max_duration"],
+        encoder_threads=options["encoder_threads"],
+        slide_workers=options["slide_workers"],
+    )
+    produced_item = {
+        "path": job["video_path"],
+        "title": job["title"],
+        "tags": job["tags"],
+        "schedule": job["schedule"],
+    }
+    # Параметры ролика известны после сборки: uploader берёт их отсюда и не
+    # запускает ffprobe/MoviePy для каждого файла.
+    manifest_item = {
+        "title": job["title"],
+        "description": job["script_text"],
+        "tags": job["tags"],
+        "video_path": job["video_path"],
+        "audio_path": job["audio_path"],
+        "schedule": job["schedule"],
+        "width": int(width),
+        "height": int(height),
+        "duration_s": round(float(duration), 3),
+        "codec": "h264",
+        "audio_codec": "aac",
+    }
+    return produced_item, manifest_item
+
+
+def _render_topic(job: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Synthesise narration and assemble the video for one prepared topic.
+
+    Runs either in-process or inside a worker of the ``build_all`` process pool,
+    so it only relies on ``job`` and the font loaded by the pool initializer.
+    """
+
+    _synthesise_topic(job)
+    return _assemble_topic(job)
+
+
+def _render_topics_pipelined(
+    jobs: Sequence[dict[str, Any]],
+) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+    """Render topics sequentially while overlapping TTS with video assembly.
+
+    A background thread synthesises narration for upcoming topics and hands them
+    over through a small bounded queue; the calling thread assembles videos in
+    order, so TTS latency hides behind encoding of the previous topic.
+    """
+
+    ready: queue.Queue[Any] = queue.Queue(maxsize=2)
+    stop = threading.Event()
+
+    def _produce() -> None:
+        try:
+            for job in jobs:
+                if stop.is_set():
+                    return
+                _synthesise_topic(job)
+                ready.put(job)
+        except BaseException as exc:  # noqa: BLE001 - re-raised in the consumer
+            ready.put(exc)
+            return
+        ready.put(None)
+
+    producer = threading.Thread(target=_produce, name="build-all-tts", daemon=True)
+    producer.start()
+    results: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    try:
+        while (item := ready.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            results.append(_assemble_topic(item))
+    finally:
+        stop.set()
+        # Освобождаем очередь, чтобы поток озвучки не завис на put().
+        while producer.is_alive():
+            try:
+                ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+    return results
+
+
 def build_all(
     settings_path: str,
     topics_path: str,
@@ -316,8 +525,29 @@ def build_all(
         RuntimeError: For invalid configuration or processing errors.
     """
 
+    return _build_topics(settings_path, _load_topics(Path(topics_path)), selection)
+
+
+def build_all_from_topics(
+    settings_path: str,
+    topics: Iterable[Mapping[str, Any]],
+    selection: Sequence[int | str] | str = "all",
+) -> list[dict[str, Any]]:
+    """Same as :func:`build_all`, but takes already parsed topic mappings.
+
+    Lets callers that hold topics in memory (e.g. the scheduler) skip writing
+    and re-parsing a temporary YAML file.
+    """
+
+    return _build_topics(settings_path, _normalise_topics(topics), selection)
+
+
+def _build_topics(
+    settings_path: str,
+    topics_all: list[dict[str, Any]],
+    selection: Sequence[int | str] | str,
+) -> list[dict[str, Any]]:
     cfg = _load_config(Path(settings_path))
-    topics_all = _load_topics(Path(topics_path))
 
     if not topics_all:
         return []
@@ -344,19 +574,13 @@ def build_all(
         width, height = 720, 1280
     max_duration = float(cfg.get("max_duration", 12.0))
 
-    produced: list[dict[str, Any]] = []
-    manifest_items: list[dict[str, Any]] = []
-
     uploader_cfg = cfg.get("uploader", {})
     default_timezone_name = str(uploader_cfg.get("timezone", SETTINGS.tz_target))
     default_timezone: ZoneInfo | None = None
     auto_enabled = bool(uploader_cfg.get("auto_schedule_if_missing"))
     auto_time = _parse_time_local(str(uploader_cfg.get("time_local", "21:00"))) if auto_enabled else None
-    if auto_enabled or any(
-        isinstance(topic.get("schedule"), str)
-        and _schedule_requires_timezone(str(topic.get("schedule")))
-        for topic in topics
-    ):
+    schedule_infos = [_prep_schedule(topic.get("schedule")) for topic in topics]
+    if auto_enabled or any(info.needs_tz for info in schedule_infos):
         default_timezone = _load_timezone(default_timezone_name)
 
     next_auto_slot = (
@@ -366,68 +590,76 @@ def build_all(
     )
     auto_offset_days = 0
 
-    for index, topic in enumerate(topics, start=1):
+    # Пул процессов включается только явно: build_all вызывают из сервера и
+    # планировщика, а каждый ролик и сам грузит ядра (слайды, x264).
+    workers = min(_parse_positive_int_env("SHORTS_RENDER_WORKERS", 1), len(topics))
+    render_options = {
+        "tts_lang": str(cfg.get("tts_lang", "ru")),
+        "tts_timeout": float(cfg.get("tts_timeout", 30)),
+        "fps": int(cfg.get("fps", 24)),
+        "resolution": (width, height),
+        "max_duration": max_duration,
+        # Несколько роликов сразу: без вложенного пула слайдов и с долей ядер на x264.
+        "encoder_threads": (
+            max(1, min(_ENCODER_THREADS, (os.cpu_count() or 1) // workers)) if workers > 1 else None
+        ),
+        "slide_workers": 1 if workers > 1 else None,
+    }
+
+    # Всё, что зависит от порядка (слоты расписания, имена файлов), считаем
+    # заранее, чтобы рендер тем можно было выполнять в любом порядке.
+    # Пути собираем строками от готовых префиксов, без Path на каждую тему.
+    audio_prefix = AUDIO_ROOT.as_posix() + "/"
+    video_prefix = VIDEO_ROOT.as_posix() + "/"
+    jobs: list[dict[str, Any]] = []
+    for index, (topic, schedule_info) in enumerate(zip(topics, schedule_infos), start=1):
         title = topic["title"]
         lines = _ensure_lines(topic.get("lines", []), title)
-        tags = _merge_tags(topic.get("tags", []), cfg.get("default_tags", []))
-        schedule = topic.get("schedule")
+        tags = merge_tags(topic.get("tags", []), cfg.get("default_tags", []))
         normalized_schedule: str | None
-        if isinstance(schedule, str) and schedule.strip():
-            normalized_schedule = _normalise_schedule(schedule.strip(), default_timezone)
+        if schedule_info.raw is not None:
+            normalized_schedule = _normalise_schedule(schedule_info, default_timezone)
         elif auto_enabled and next_auto_slot is not None:
             scheduled_dt = next_auto_slot + timedelta(days=auto_offset_days)
             auto_offset_days += 1
             normalized_schedule = scheduled_dt.isoformat()
         else:
             normalized_schedule = None
-        script_text = "\n".join(lines)
 
         slug = _slugify(f"{index}-{title}")
-        audio_path = AUDIO_ROOT / f"{slug}.mp3"
-        video_path = VIDEO_ROOT / f"{slug}.mp4"
-
-        synth_sync(
-            script_text,
-            audio_path,
-            lang=str(cfg.get("tts_lang", "ru")),
-            timeout=float(cfg.get("tts_timeout", 30)),
-        )
-
-        assemble_short(
-            lines,
-            audio_path.as_posix(),
-            title,
-            video_path.as_posix(),
-            fps=int(cfg.get("fps", 24)),
-            resolution=(width, height),
-            max_duration=max_duration,
-        )
-
-        produced_item = {
-            "path": video_path.as_posix(),
-            "title": title,
-            "tags": tags,
-            "schedule": normalized_schedule,
-        }
-        produced.append(produced_item)
-
-        manifest_items.append(
+        jobs.append(
             {
                 "title": title,
-                "description": script_text,
+                "lines": lines,
                 "tags": tags,
-                "video_path": video_path.as_posix(),
-                "audio_path": audio_path.as_posix(),
                 "schedule": normalized_schedule,
+                "script_text": "\n".join(lines),
+                "audio_path": f"{audio_prefix}{slug}.mp3",
+                "video_path": f"{video_prefix}{slug}.mp4",
+                "options": render_options,
             }
         )
 
-    MANIFEST_PATH.write_text(
-        json.dumps({"items": manifest_items}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    if workers > 1:
+        font_args = (str(cfg.get("font")), int(cfg.get("font_size", 64)))
+        # spawn, а не fork: вызывающий процесс многопоточный (сервер, планировщик).
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_font,
+            initargs=font_args,
+        ) as pool:
+            # map сохраняет порядок тем и пробрасывает первую ошибку.
+            results = list(pool.map(_render_topic, jobs))
+    else:
+        results = _render_topics_pipelined(jobs)
+
+    produced = [produced_item for produced_item, _ in results]
+    manifest_items = [manifest_item for _, manifest_item in results]
+
+    _write_manifest({"items": manifest_items})
 
     return produced
 
 
-__all__ = ["build_all", "MANIFEST_PATH"]
+__all__ = ["build_all", "build_all_from_topics", "MANIFEST_PATH"]
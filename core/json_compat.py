@@ -0,0 +1,45 @@
+"""JSON helpers that use :mod:`orjson` when it is installed.
+
+``orjson`` parses and serialises noticeably faster than the stdlib module, but
+it is an optional dependency: without it the functions fall back to
+:mod:`json` with identical output (UTF-8, no ASCII escaping).
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - fallback to the standard library
+    orjson = None
+
+# ``orjson.JSONDecodeError`` наследуется от ``json.JSONDecodeError``,
+# поэтому вызывающему коду достаточно ловить стандартное исключение.
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: str | bytes | bytearray) -> Any:
+    """Parse JSON from ``str`` or UTF-8 ``bytes``."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(payload: Any, *, indent: bool = False) -> bytes:
+    """Serialise ``payload`` to UTF-8 bytes, optionally with two-space indent."""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # orjson не умеет, например, нестроковые ключи — отдаём stdlib.
+            pass
+    if indent:
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+__all__ = ["JSONDecodeError", "dumps", "loads"]
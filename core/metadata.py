@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
-import re
+import shutil
+import string
+import subprocess
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Iterable
 
-try:
-    from moviepy import VideoFileClip
-except ImportError:  # pragma: no cover - fallback for MoviePy<2.0
-    from moviepy.editor import VideoFileClip
+from core import json_compat
 
 TITLE_LIMIT = 100
 DESCRIPTION_LIMIT = 4900
@@ -20,6 +21,26 @@ ASPECT_RATIO = 9 / 16
 ASPECT_TOLERANCE = 0.03
 MAX_DURATION_SECONDS = 60.0
 
+# MoviePy тянет numpy/imageio/proglog, поэтому импортируем его только при
+# первой проверке видео, а не при импорте модуля.
+_VideoFileClip: Any = None
+
+
+class _TagTable(dict):
+    """``str.translate`` table keeping ASCII alphanumerics (lowercased).
+
+    Any other code point maps to ``None`` and is deleted; misses are memoised so
+    repeated non-ASCII characters stay on the C fast path.
+    """
+
+    def __missing__(self, key: int) -> None:
+        self[key] = None
+        return None
+
+
+_TAG_TABLE = _TagTable({ord(char): char for char in string.digits + string.ascii_lowercase})
+_TAG_TABLE.update({ord(char): char.lower() for char in string.ascii_uppercase})
+
 
 @dataclass(slots=True)
 class MetadataPayload:
@@ -45,7 +66,12 @@ class VideoInspection:
 
 
 def _normalize_title(title: str) -> str:
-    normalized = " ".join(title.strip().split())
+    normalized = title.strip()
+    # Обычно пробелы уже нормализованы: isprintable() ложно для любых пробельных
+    # символов, кроме ASCII-пробела, так что split/join нужен только при двойных
+    # пробелах или табуляциях/переводах строк.
+    if "  " in normalized or not normalized.isprintable():
+        normalized = " ".join(normalized.split())
     if len(normalized) > TITLE_LIMIT:
         normalized = normalized[:TITLE_LIMIT].rstrip()
     if not normalized:
@@ -57,7 +83,8 @@ def _normalize_description(description: str, hashtags: list[str]) -> str:
     normalized = description.strip()
     if hashtags:
         hashtags_block = " ".join(hashtags)
-        if hashtags_block not in normalized:
+        # Блок хэштегов почти всегда стоит в конце: endswith дешевле поиска подстроки.
+        if not normalized.endswith(hashtags_block) and hashtags_block not in normalized:
             if normalized:
                 normalized = f"{normalized}\n\n{hashtags_block}"
             else:
@@ -68,12 +95,24 @@ def _normalize_description(description: str, hashtags: list[str]) -> str:
 
 
 def _normalize_tag(raw: str) -> str | None:
-    cleaned = re.sub(r"[^0-9a-zA-Z]+", "", raw).lower()
+    cleaned = raw.translate(_TAG_TABLE)
     if not cleaned:
         return None
     return cleaned
 
 
+def merge_tags(*tag_sources: Iterable[str]) -> list[str]:
+    """Concatenate tag lists, stripping blanks and dropping repeats (first wins)."""
+
+    # dict сохраняет порядок вставки, поэтому дедупликация остаётся линейной.
+    normalized = (
+        cleaned
+        for tag in chain.from_iterable(tag_sources)
+        if (cleaned := str(tag).strip())
+    )
+    return list(dict.fromkeys(normalized))
+
+
 def normalize_metadata(title: str, description: str, tags: Iterable[str]) -> MetadataPayload:
     """Return sanitized metadata enforcing YouTube Shorts constraints."""
 
@@ -105,13 +144,70 @@ def normalize_metadata(title: str, description: str, tags: Iterable[str]) -> Met
     )
 
 
+def _video_file_clip() -> Any:
+    global _VideoFileClip
+    if _VideoFileClip is None:
+        try:
+            from moviepy import VideoFileClip
+        except ImportError:  # pragma: no cover - fallback for MoviePy<2.0
+            from moviepy.editor import VideoFileClip
+        _VideoFileClip = VideoFileClip
+    return _VideoFileClip
+
+
+@lru_cache(maxsize=1)
+def _ffprobe_path() -> str | None:
+    return shutil.which("ffprobe")
+
+
+def _probe_with_ffprobe(file_path: Path) -> VideoInspection | None:
+    """Read size and duration from container metadata without decoding frames."""
+
+    ffprobe = _ffprobe_path()
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [
+                ffprobe,
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "stream=width,height:format=duration",
+                "-of",
+                "json",
+                file_path.as_posix(),
+            ],
+            capture_output=True,
+            check=True,
+        )
+        probe = json_compat.loads(result.stdout)
+        stream = probe["streams"][0]
+        return VideoInspection(
+            duration=float(probe.get("format", {}).get("duration") or 0.0),
+            width=int(stream["width"]),
+            height=int(stream["height"]),
+        )
+    except (OSError, subprocess.CalledProcessError, KeyError, IndexError, TypeError, ValueError):
+        # JSONDecodeError — подкласс ValueError; при любой ошибке пробуем MoviePy.
+        return None
+
+
 def inspect_video(path: str | Path) -> VideoInspection:
-    """Collect duration and size information for a rendered video."""
+    """Collect duration and size information for a rendered video.
+
+    Uses ``ffprobe`` when it is on ``PATH`` and falls back to MoviePy otherwise.
+    """
 
     file_path = Path(path)
     if not file_path.exists():
         raise FileNotFoundError(f"Video file not found: {file_path}")
-    with VideoFileClip(file_path.as_posix()) as clip:
+    probed = _probe_with_ffprobe(file_path)
+    if probed is not None:
+        return probed
+    with _video_file_clip()(file_path.as_posix()) as clip:
         duration = float(clip.duration or 0.0)
         width, height = clip.size
     return VideoInspection(duration=duration, width=int(width), height=int(height))
@@ -135,5 +231,6 @@ __all__ = [
     "VideoInspection",
     "normalize_metadata",
     "inspect_video",
+    "merge_tags",
     "validate_video",
 ]
@@ -0,0 +1,24 @@
+"""FastAPI response class that serialises through :mod:`core.json_compat`.
+
+Used as ``default_response_class`` so that every JSON route is rendered with
+:mod:`orjson` when it is installed; without it the output matches Starlette's
+``JSONResponse`` (UTF-8, no ASCII escaping, compact separators).
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from core import json_compat
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_compat.dumps(content)
+
+
+__all__ = ["ORJSONResponse"]
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime, time, timezone
+from functools import lru_cache
 from typing import Tuple
 
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
@@ -19,6 +20,7 @@ class ScheduleParseError(ValueError):
     """Raised when a human-readable schedule cannot be parsed."""
 
 
+@lru_cache(maxsize=128)
 def _resolve_timezone(label: str, default_tz: str) -> ZoneInfo:
     candidate = TZ_ALIASES.get(label.upper(), label) if label else default_tz
     try:
@@ -2,17 +2,19 @@
 
 from __future__ import annotations
 
-import json
 import logging
 from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
 from itertools import cycle, islice
+from operator import itemgetter
 from pathlib import Path
 from typing import Any, Callable, Iterable, List
 
-import yaml
 from zoneinfo import ZoneInfo
 
-from core.generate import MANIFEST_PATH, build_all
+from core import json_compat
+from core.atomic_io import atomic_write_bytes
+from core.generate import MANIFEST_PATH, build_all_from_topics
 from core.upload import upload_manifest
 
 logger = logging.getLogger(__name__)
@@ -24,10 +26,15 @@ DEFAULT_TAGS = ["#shorts", "#cartoon", "#comedy", "#viral"]
 VALID_STATUSES = {"queued", "rendered", "uploaded", "failed"}
 DEFAULT_DAYS = 30
 
-SCHEDULE_FILE = Path("data/schedule.json")
-TEMP_TOPICS_PATH = Path("data/scheduler_topic.yaml")
+SCHEDULE_FILE = Path("data/schedule.ndjson")
+LEGACY_SCHEDULE_FILE = Path("data/schedule.json")
 DEFAULT_CONFIG_PATH = Path("config.yaml")
 
+_ALMATY = ZoneInfo(ALMATY_TZ)
+_NEVER = datetime.max.replace(tzinfo=timezone.utc)
+_DEFAULT_LINES = tuple(DEFAULT_LINES)
+_DEFAULT_TAGS = tuple(DEFAULT_TAGS)
+
 
 def _topic_model_cls():
     """Import TopicModel lazily to avoid circular import with ``server``."""
@@ -37,6 +44,7 @@ def _topic_model_cls():
     return TopicModel
 
 
+@lru_cache(maxsize=64)
 def _parse_slot(slot: str) -> time:
     try:
         hour_str, minute_str = slot.split(":", 1)
@@ -50,7 +58,7 @@ def _parse_slot(slot: str) -> time:
 
 
 def _ensure_iterable(items: Iterable[str], total: int, fill: str) -> List[str]:
-    buffer = [str(item).strip() for item in items if str(item).strip()]
+    buffer = [cleaned for item in items if (cleaned := str(item).strip())]
     if not buffer:
         buffer = [fill.format(index=i) for i in range(1, total + 1)]
     if len(buffer) >= total:
@@ -62,9 +70,19 @@ def _default_topics(total: int) -> List[str]:
     return [f"Crazy Cat Fails #{index}" for index in range(1, total + 1)]
 
 
-def _format_schedule(dt_local: datetime) -> str:
-    dt_utc = dt_local.astimezone(timezone.utc).replace(microsecond=0)
-    return dt_utc.isoformat().replace("+00:00", "Z")
+def _format_schedule(dt_local: datetime, utc_offset: timedelta | None = None) -> str:
+    """Format an aware local datetime as ``YYYY-MM-DDTHH:MM:SSZ``.
+
+    ``utc_offset`` lets callers that already know the zone's offset for this
+    date skip the ``astimezone`` lookup.
+    """
+
+    if utc_offset is None:
+        utc_offset = dt_local.utcoffset() or timedelta(0)
+    dt_utc = dt_local.replace(tzinfo=None) - utc_offset
+    # isoformat на naive-времени уже не содержит "+00:00", и он примерно вдвое
+    # быстрее strftime("%Y-%m-%dT%H:%M:%SZ"), который идёт через libc.
+    return dt_utc.isoformat(timespec="seconds") + "Z"
 
 
 def make_month_plan(
@@ -77,34 +95,46 @@ def make_month_plan(
     slots = slots_local or list(DEFAULT_SLOTS)
     if not slots:
         slots = list(DEFAULT_SLOTS)
-    tz_local = ZoneInfo(ALMATY_TZ)
+    tz_local = _ALMATY
     total_slots = len(slots) * DEFAULT_DAYS
 
-    topics_input = [str(topic).strip() for topic in topics_seed if str(topic).strip()]
+    topics_input = [cleaned for topic in topics_seed if (cleaned := str(topic).strip())]
     if not topics_input:
         topics_input = _default_topics(total_slots)
     else:
         topics_input = _ensure_iterable(topics_input, total_slots, "Topic #{index}")
 
     TopicModel = _topic_model_cls()
+    # Поля плана мы формируем сами (строки уже очищены), поэтому валидацию
+    # pydantic пропускаем; валидаторы не срабатывают, так что списки копируем.
+    construct = getattr(TopicModel, "model_construct", None) or TopicModel.construct
     plan: list[TopicModel] = []
 
+    # Слоты разбираем один раз, а не заново для каждого из 30 дней.
+    parsed_slots = [_parse_slot(slot) for slot in slots]
+    day_locals = [start_date_local + timedelta(days=day_offset) for day_offset in range(DEFAULT_DAYS)]
+
     topic_iter = iter(topics_input)
-    for day_offset in range(DEFAULT_DAYS):
-        day_local = start_date_local + timedelta(days=day_offset)
-        for slot in slots:
-            slot_time = _parse_slot(slot)
+    for day_offset, day_local in enumerate(day_locals):
+        # Смещение зоны берём один раз на день; если внутри дня оно меняется
+        # (переход на летнее время), считаем его для каждого слота.
+        day_start = datetime.combine(day_local, time.min, tzinfo=tz_local)
+        day_end = datetime.combine(day_local, time.max, tzinfo=tz_local)
+        day_offset_utc = day_start.utcoffset()
+        if day_offset_utc != day_end.utcoffset():
+            day_offset_utc = None
+        for slot_time in parsed_slots:
             dt_local = datetime.combine(day_local, slot_time, tzinfo=tz_local)
-            schedule_iso = _format_schedule(dt_local)
+            schedule_iso = _format_schedule(dt_local, day_offset_utc)
             try:
                 title = next(topic_iter)
             except StopIteration:  # pragma: no cover - defensive
                 title = f"Topic #{day_offset * len(slots) + 1}"
             plan.append(
-                TopicModel(
+                construct(
                     title=title,
-                    lines=list(DEFAULT_LINES),
-                    tags=list(DEFAULT_TAGS),
+                    lines=list(_DEFAULT_LINES),
+                    tags=list(_DEFAULT_TAGS),
                     schedule=schedule_iso,
                 )
             )
@@ -112,51 +142,106 @@ def make_month_plan(
     return plan
 
 
-def load_schedule() -> dict[str, Any]:
-    """Load schedule JSON or return an empty structure."""
+def _normalise_record(entry: Any) -> dict[str, Any] | None:
+    if not isinstance(entry, dict):
+        return None
+    title = str(entry.get("title", "")).strip()
+    schedule_str = str(entry.get("schedule", "")).strip()
+    if not title or not schedule_str:
+        return None
+    status = str(entry.get("status", "queued")).strip() or "queued"
+    if status not in VALID_STATUSES:
+        status = "queued"
+    record = {
+        "title": title,
+        "schedule": schedule_str,
+        "status": status,
+        "lines": entry.get("lines") or list(DEFAULT_LINES),
+        "tags": entry.get("tags") or list(DEFAULT_TAGS),
+        "_dt": _parse_schedule(schedule_str),
+    }
+    if "error" in entry and entry["error"]:
+        record["error"] = str(entry["error"])
+    return record
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json_compat.loads(line)
+    except json_compat.JSONDecodeError:
+        logger.warning("Skipping invalid line in %s", SCHEDULE_FILE.name)
+        return None
+
 
-    if not SCHEDULE_FILE.exists():
-        return {"items": []}
+def _read_legacy_entries() -> list[Any]:
+    """Entries from the pre-NDJSON ``schedule.json`` (``{"items": [...]}``)."""
+
+    if not LEGACY_SCHEDULE_FILE.exists():
+        return []
     try:
-        raw = json.loads(SCHEDULE_FILE.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
+        raw = json_compat.loads(LEGACY_SCHEDULE_FILE.read_bytes())
+    except json_compat.JSONDecodeError:
         logger.warning("schedule.json is not valid JSON; starting with empty queue")
-        return {"items": []}
-    if not isinstance(raw, dict):
-        return {"items": []}
-    items_raw = raw.get("items")
-    if not isinstance(items_raw, list):
-        return {"items": []}
-
-    items: list[dict[str, Any]] = []
-    for entry in items_raw:
-        if not isinstance(entry, dict):
-            continue
-        title = str(entry.get("title", "")).strip()
-        schedule_str = str(entry.get("schedule", "")).strip()
-        if not title or not schedule_str:
-            continue
-        status = str(entry.get("status", "queued")).strip() or "queued"
-        if status not in VALID_STATUSES:
-            status = "queued"
-        record = {
-            "title": title,
-            "schedule": schedule_str,
-            "status": status,
-            "lines": entry.get("lines") or list(DEFAULT_LINES),
-            "tags": entry.get("tags") or list(DEFAULT_TAGS),
-        }
-        if "error" in entry and entry["error"]:
-            record["error"] = str(entry["error"])
-        items.append(record)
-    items.sort(key=lambda item: item["schedule"])
+        return []
+    items_raw = raw.get("items") if isinstance(raw, dict) else None
+    return items_raw if isinstance(items_raw, list) else []
+
+
+def load_schedule() -> dict[str, Any]:
+    """Load the schedule or return an empty structure.
+
+    The schedule is stored as NDJSON (one item per line, sorted by publish
+    time). A legacy ``schedule.json`` is read if no NDJSON file exists yet and
+    is migrated on the next save.
+
+    Each item carries its parsed UTC ``schedule`` under the in-memory-only key
+    ``_dt`` (``None`` if unparsable); :func:`save_schedule` never writes it.
+    """
+
+    if SCHEDULE_FILE.exists():
+        entries: Iterable[Any] = (
+            _parse_line(line) for line in SCHEDULE_FILE.read_bytes().splitlines() if line.strip()
+        )
+    else:
+        entries = _read_legacy_entries()
+    items = [record for entry in entries if (record := _normalise_record(entry)) is not None]
+    items.sort(key=lambda item: _schedule_sort_key(item["_dt"]))
     return {"items": items}
 
 
-def save_schedule(items: Iterable[dict[str, Any]]) -> None:
-    """Persist schedule items to ``data/schedule.json``."""
+def _load_due_head(now_utc: datetime, limit: int) -> tuple[list[dict[str, Any]], list[bytes]]:
+    """Parse only the due prefix of the NDJSON schedule.
+
+    Returns the parsed records up to the first item that is not yet due (or
+    until ``limit`` queued items were found) and the remaining raw lines, which
+    :func:`queue_due` writes back untouched. Items that are already rendered,
+    uploaded or failed stay at the head of the file, so every tick still parses
+    all past rows; only the future part is skipped.
+    """
 
-    payload = {"items": []}
+    if SCHEDULE_FILE.exists():
+        lines = [line for line in SCHEDULE_FILE.read_bytes().splitlines() if line.strip()]
+    else:
+        # Старый schedule.json: переводим в строки NDJSON и идём общим путём.
+        lines = _encode_records(load_schedule()["items"])
+    head: list[dict[str, Any]] = []
+    queued = 0
+    for index, line in enumerate(lines):
+        record = _normalise_record(_parse_line(line))
+        if record is None:
+            continue
+        if _schedule_sort_key(record["_dt"]) > now_utc:
+            return head, lines[index:]
+        head.append(record)
+        if record["status"] == "queued":
+            queued += 1
+            if queued >= limit:
+                return head, lines[index + 1 :]
+    return head, []
+
+
+def _encode_records(items: Iterable[dict[str, Any]]) -> list[bytes]:
+    keyed: list[tuple[datetime, dict[str, Any]]] = []
     for entry in items:
         if not isinstance(entry, dict):
             continue
@@ -167,57 +252,81 @@ def save_schedule(items: Iterable[dict[str, Any]]) -> None:
         status = str(entry.get("status", "queued")).strip() or "queued"
         if status not in VALID_STATUSES:
             status = "queued"
-        payload["items"].append(
-            {
-                "title": title,
-                "schedule": schedule,
-                "status": status,
-                "lines": entry.get("lines") or list(DEFAULT_LINES),
-                "tags": entry.get("tags") or list(DEFAULT_TAGS),
-                **({"error": str(entry.get("error"))} if entry.get("error") else {}),
-            }
+        # Записи из load_schedule уже несут разобранный _dt.
+        schedule_dt = entry["_dt"] if "_dt" in entry else _parse_schedule(schedule)
+        keyed.append(
+            (
+                _schedule_sort_key(schedule_dt),
+                {
+                    "title": title,
+                    "schedule": schedule,
+                    "status": status,
+                    "lines": entry.get("lines") or list(DEFAULT_LINES),
+                    "tags": entry.get("tags") or list(DEFAULT_TAGS),
+                    **({"error": str(entry.get("error"))} if entry.get("error") else {}),
+                },
+            )
         )
 
-    SCHEDULE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SCHEDULE_FILE.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Файл храним отсортированным по времени публикации (стабильная сортировка):
+    # на этом порядке держится ранний выход _load_due_head.
+    keyed.sort(key=itemgetter(0))
+    return [json_compat.dumps(record) for _, record in keyed]
+
+
+def _write_schedule_lines(lines: list[bytes]) -> None:
+    # Пишем одним буфером и атомарно подменяем расписание:
+    # при падении посреди записи старый файл остаётся целым.
+    atomic_write_bytes(SCHEDULE_FILE, b"".join(line + b"\n" for line in lines))
+
+
+def save_schedule(items: Iterable[dict[str, Any]]) -> None:
+    """Persist schedule items to ``data/schedule.ndjson``."""
+
+    _write_schedule_lines(_encode_records(items))
 
 
 def _parse_schedule(value: str) -> datetime | None:
     if not value:
         return None
-    raw = value.replace("Z", "+00:00")
+    if value.endswith("Z"):
+        # Основной формат make_month_plan: "...Z" — это UTC, отрезаем суффикс
+        # и ставим tzinfo сами, без замены строки и разбора смещения.
+        try:
+            parsed = datetime.fromisoformat(value[:-1])
+        except ValueError:
+            parsed = None
+        if parsed is None or parsed.tzinfo is not None:
+            logger.warning("Invalid schedule entry encountered: %s", value)
+            return None
+        return parsed.replace(tzinfo=timezone.utc)
     try:
-        parsed = datetime.fromisoformat(raw)
+        parsed = datetime.fromisoformat(value)
     except ValueError:
         logger.warning("Invalid schedule entry encountered: %s", value)
         return None
     if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.replace(tzinfo=timezone.utc)
+    if parsed.utcoffset() == timedelta(0):
+        # Уже UTC (в том числе суффикс "Z"): astimezone не нужен.
+        return parsed.replace(tzinfo=timezone.utc)
     return parsed.astimezone(timezone.utc)
 
 
+def _schedule_sort_key(schedule_dt: datetime | None) -> datetime:
+    # Записи с некорректным schedule уходят в конец и никогда не считаются due.
+    return _NEVER if schedule_dt is None else schedule_dt
+
+
 def _render_topic(title: str, lines: list[str], tags: list[str], schedule: str) -> list[dict[str, Any]]:
-    temp_payload = [
-        {
-            "title": title,
-            "lines": list(lines) or list(DEFAULT_LINES),
-            "tags": list(tags) or list(DEFAULT_TAGS),
-            "schedule": schedule,
-        }
-    ]
-    TEMP_TOPICS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    TEMP_TOPICS_PATH.write_text(
-        yaml.safe_dump(temp_payload, allow_unicode=True, sort_keys=False),
-        encoding="utf-8",
-    )
-    try:
-        produced = build_all(str(DEFAULT_CONFIG_PATH), str(TEMP_TOPICS_PATH), "all")
-    finally:
-        try:
-            TEMP_TOPICS_PATH.unlink()
-        except FileNotFoundError:
-            pass
-    return produced
+    topic = {
+        "title": title,
+        "lines": list(lines) or list(DEFAULT_LINES),
+        "tags": list(tags) or list(DEFAULT_TAGS),
+        "schedule": schedule,
+    }
+    # Тема передаётся в генератор напрямую, без временного YAML-файла.
+    return build_all_from_topics(str(DEFAULT_CONFIG_PATH), [topic], "all")
 
 
 def queue_due(
@@ -228,11 +337,6 @@ def queue_due(
 ) -> dict[str, Any]:
     """Pick queued topics with schedule <= now and build/upload them."""
 
-    schedule_data = load_schedule()
-    items = schedule_data.get("items", [])
-    if not isinstance(items, list) or not items:
-        return {"picked": 0, "produced": [], "errors": []}
-
     try:
         limit_value = int(limit)
     except (TypeError, ValueError):
@@ -241,19 +345,13 @@ def queue_due(
         return {"picked": 0, "produced": [], "errors": []}
 
     now_utc = datetime.now(timezone.utc)
-    due_indices: list[int] = []
-    for idx, entry in enumerate(items):
-        if not isinstance(entry, dict):
-            continue
-        if entry.get("status") != "queued":
-            continue
-        schedule_dt = _parse_schedule(str(entry.get("schedule", "")))
-        if schedule_dt is None:
-            continue
-        if schedule_dt <= now_utc:
-            due_indices.append(idx)
-        if len(due_indices) >= limit_value:
-            break
+    # Разбираем только голову очереди; остальные строки файла пишем обратно как есть.
+    items, tail_lines = _load_due_head(now_utc, limit_value)
+    if not items:
+        return {"picked": 0, "produced": [], "errors": []}
+
+    # В голове только наступившие записи и не больше limit_value из них в очереди.
+    due_indices = [idx for idx, item in enumerate(items) if item.get("status") == "queued"]
 
     if not due_indices:
         return {"picked": 0, "produced": [], "errors": []}
@@ -293,7 +391,7 @@ def queue_due(
                     entry["status"] = "uploaded"
                 else:
                     entry["status"] = "failed"
-                    entry["error"] = json.dumps(upload_results, ensure_ascii=False)
+                    entry["error"] = json_compat.dumps(upload_results).decode("utf-8")
                     errors.append({"title": title, "error": entry["error"]})
             else:
                 produced_item["upload"] = []
@@ -308,7 +406,7 @@ def queue_due(
         finally:
             items[idx] = entry
 
-    save_schedule(items)
+    _write_schedule_lines(_encode_records(items) + tail_lines)
 
     return {"picked": len(due_indices), "produced": produced_summary, "errors": errors}
 
@@ -2,27 +2,37 @@
 
 from __future__ import annotations
 
-import json
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import partial
 from pathlib import Path
 from typing import Any, Iterable, Sequence
 
-import yaml
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from core.metadata import inspect_video, normalize_metadata, validate_video
+from core import json_compat, yaml_compat
+from core.metadata import (
+    VideoInspection,
+    inspect_video,
+    merge_tags,
+    normalize_metadata,
+    validate_video,
+)
 from core.settings import get_settings
 from upload_youtube import upload_video
 
 logger = logging.getLogger(__name__)
-SETTINGS = get_settings()
+# Сколько роликов грузим параллельно; переопределяется MAX_UPLOAD_CONCURRENCY
+# (не стоит задирать — каждая загрузка расходует квоту YouTube API).
+DEFAULT_UPLOAD_CONCURRENCY = 2
 
 
 def _load_manifest(manifest_path: Path) -> list[dict[str, Any]]:
     if not manifest_path.exists():
         return []
-    data = json.loads(manifest_path.read_text(encoding="utf-8"))
+    data = json_compat.loads(manifest_path.read_bytes())
     items = data.get("items") if isinstance(data, dict) else data
     if not isinstance(items, list):
         return []
@@ -37,26 +47,22 @@ def _load_settings(settings_path: Path) -> dict[str, Any]:
     if not settings_path.exists():
         return {}
     with settings_path.open("r", encoding="utf-8") as stream:
-        data = yaml.safe_load(stream) or {}
+        data = yaml_compat.safe_load(stream) or {}
     if not isinstance(data, dict):
         return {}
     return data
 
 
-def _merge_tags(*tag_sources: Iterable[str]) -> list[str]:
-    merged: list[str] = []
-    for source in tag_sources:
-        for tag in source:
-            normalized = str(tag).strip()
-            if normalized and normalized not in merged:
-                merged.append(normalized)
-    return merged
+def _timezone_name_from_settings(settings: dict[str, Any]) -> str:
+    uploader_cfg = settings.get("uploader") if isinstance(settings.get("uploader"), dict) else {}
+    return str(uploader_cfg.get("timezone") or get_settings().tz_target)
 
 
 def _load_timezone_from_settings(settings: dict[str, Any]) -> ZoneInfo:
-    uploader_cfg = settings.get("uploader") if isinstance(settings.get("uploader"), dict) else {}
-    tz_name = str(uploader_cfg.get("timezone") or SETTINGS.tz_target)
+    tz_name = _timezone_name_from_settings(settings)
     try:
+        # ZoneInfo сам кеширует объект по ключу, поэтому на каждую запись
+        # манифеста tzdata заново не читается.
         return ZoneInfo(tz_name)
     except ZoneInfoNotFoundError as exc:
         raise RuntimeError(f"Не найдена таймзона '{tz_name}' для uploader") from exc
@@ -72,27 +78,32 @@ def _parse_schedule(schedule: str | None, settings: dict[str, Any]) -> datetime
     if parsed.tzinfo is None:
         tz = _load_timezone_from_settings(settings)
         parsed = parsed.replace(tzinfo=tz)
+    elif parsed.utcoffset() == timedelta(0):
+        return parsed.replace(tzinfo=timezone.utc)
     return parsed.astimezone(timezone.utc)
 
 
 def _default_tags_from_settings(settings: dict[str, Any]) -> list[str]:
     defaults: Sequence[str] = []
     if isinstance(settings.get("default_tags"), (list, tuple)):
-        defaults = [str(tag).strip() for tag in settings.get("default_tags", []) if str(tag).strip()]
+        defaults = settings["default_tags"]
     elif isinstance(settings.get("shorts_hashtags"), (list, tuple)):
-        defaults = [
-            str(tag).strip()
-            for tag in settings.get("shorts_hashtags", [])
-            if str(tag).strip()
-        ]
-    return _merge_tags(defaults, SETTINGS.channel_default_tags)
+        defaults = settings["shorts_hashtags"]
+    # merge_tags сам приводит теги к str, обрезает пробелы и отбрасывает пустые.
+    return merge_tags(defaults, get_settings().channel_default_tags)
 
 
-def _ensure_future_publish_at(publish_at: datetime | None, *, min_delta_minutes: int = 60) -> datetime | None:
+def _ensure_future_publish_at(
+    publish_at: datetime | None,
+    *,
+    now_utc: datetime | None = None,
+    min_delta_minutes: int = 60,
+) -> datetime | None:
     if publish_at is None:
         return None
-    now = datetime.now(timezone.utc)
-    minimum = now + timedelta(minutes=min_delta_minutes)
+    if now_utc is None:
+        now_utc = datetime.now(timezone.utc)
+    minimum = now_utc + timedelta(minutes=min_delta_minutes)
     if publish_at < minimum:
         logger.info(
             "Adjusting publishAt to respect 60-minute safety window",
@@ -107,16 +118,115 @@ def _cleanup_artifacts(entry: dict[str, Any]) -> None:
         value = entry.get(key)
         if not value:
             continue
-        path = Path(value)
         try:
-            path.unlink(missing_ok=True)
+            os.unlink(value)
+        except FileNotFoundError:
+            pass
         except Exception:  # pragma: no cover - best effort cleanup
-            logger.warning("Failed to remove artefact", extra={"path": path.as_posix()})
+            logger.warning("Failed to remove artefact", extra={"path": str(value)})
+
+
+def _upload_concurrency() -> int:
+    raw = os.getenv("MAX_UPLOAD_CONCURRENCY", "").strip()
+    try:
+        value = int(raw) if raw else DEFAULT_UPLOAD_CONCURRENCY
+    except ValueError:
+        return DEFAULT_UPLOAD_CONCURRENCY
+    return value if value > 0 else DEFAULT_UPLOAD_CONCURRENCY
+
+
+def _force_inspect_from_env() -> bool:
+    return os.getenv("UPLOAD_FORCE_INSPECT", "").strip().lower() in {"1", "true", "yes", "on"}
 
 
-def upload_manifest(manifest_path: str, settings_path: str) -> list[dict[str, str]]:
-    """Upload all entries defined in the generation manifest."""
+def _video_info_from_entry(entry: dict[str, Any], video_path: str) -> VideoInspection | None:
+    """Build ``VideoInspection`` from manifest fields written by ``build_all``."""
 
+    try:
+        width = int(entry["width"])
+        height = int(entry["height"])
+        duration = float(entry["duration_s"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    return VideoInspection(duration=duration, width=width, height=height)
+
+
+def _upload_entry(
+    entry: dict[str, Any],
+    *,
+    settings: dict[str, Any],
+    category_id: str,
+    privacy_status_default: str,
+    default_tags: list[str],
+    now_utc: datetime | None = None,
+    force_inspect: bool = False,
+) -> dict[str, str]:
+    """Validate and upload one manifest entry; failures become a ``failed`` result."""
+
+    # inspect_video и upload_video принимают строку, отдельный Path не нужен.
+    video_path = str(entry["video_path"])
+    try:
+        combined_tags = merge_tags(entry.get("tags", []), default_tags)
+        metadata = normalize_metadata(entry["title"], entry.get("description", ""), combined_tags)
+        video_info = None if force_inspect else _video_info_from_entry(entry, video_path)
+        if video_info is None:
+            video_info = inspect_video(video_path)
+        validate_video(video_info)
+        schedule_utc = _parse_schedule(entry.get("schedule"), settings)
+        publish_at = _ensure_future_publish_at(schedule_utc, now_utc=now_utc)
+        logger.info(
+            "Prepared upload entry",
+            extra={
+                "title": metadata.title,
+                "publishAt": publish_at.isoformat() if publish_at else None,
+            },
+        )
+        privacy_status = privacy_status_default
+        if publish_at is not None:
+            privacy_status = "private"
+        response = upload_video(
+            video_path,
+            metadata.title,
+            metadata.description,
+            metadata.tags,
+            category_id=category_id,
+            privacy_status=privacy_status,
+            publish_at=publish_at,
+        )
+        response.setdefault("title", metadata.title)
+        return response
+    except Exception as exc:
+        logger.error(
+            "Upload skipped due to validation error",
+            extra={"title": entry.get("title"), "error": str(exc)},
+        )
+        return {
+            "title": str(entry.get("title", "")),
+            "status": "failed",
+            "reason": str(exc),
+        }
+    finally:
+        _cleanup_artifacts(entry)
+
+
+def upload_manifest(
+    manifest_path: str,
+    settings_path: str,
+    *,
+    force_inspect: bool | None = None,
+) -> list[dict[str, str]]:
+    """Upload all entries defined in the generation manifest.
+
+    Entries carrying ``width``/``height``/``duration_s`` (written by ``build_all``)
+    are validated from those fields without probing the file. ``force_inspect``
+    (or ``UPLOAD_FORCE_INSPECT=1``) probes every video anyway, e.g. for a
+    hand-edited or suspect manifest.
+    """
+
+    # Одна отметка времени на весь манифест: окно publishAt считается от неё.
+    now_utc = datetime.now(timezone.utc)
     manifest_file = Path(manifest_path)
     settings_file = Path(settings_path)
 
@@ -126,53 +236,29 @@ def upload_manifest(manifest_path: str, settings_path: str) -> list[dict[str, st
     if not items:
         return []
 
-    category_id = str(settings.get("categoryId", SETTINGS.default_category_id))
-    privacy_status_default = str(settings.get("privacyStatus", SETTINGS.default_privacy))
+    # get_settings() кеширован; окружение читается при первом вызове, а не при импорте.
+    env_settings = get_settings()
+    category_id = str(settings.get("categoryId", env_settings.default_category_id))
+    privacy_status_default = str(settings.get("privacyStatus", env_settings.default_privacy))
     default_tags = _default_tags_from_settings(settings)
 
-    results: list[dict[str, str]] = []
-    for entry in items:
-        video_path = Path(entry["video_path"])
-        try:
-            combined_tags = _merge_tags(entry.get("tags", []), default_tags)
-            metadata = normalize_metadata(entry["title"], entry.get("description", ""), combined_tags)
-            video_info = inspect_video(video_path)
-            validate_video(video_info)
-            schedule_utc = _parse_schedule(entry.get("schedule"), settings)
-            publish_at = _ensure_future_publish_at(schedule_utc)
-            logger.info(
-                "Prepared upload entry",
-                extra={
-                    "title": metadata.title,
-                    "publishAt": publish_at.isoformat() if publish_at else None,
-                },
-            )
-            privacy_status = privacy_status_default
-            if publish_at is not None:
-                privacy_status = "private"
-            response = upload_video(
-                video_path,
-                metadata.title,
-                metadata.description,
-                metadata.tags,
-                category_id=category_id,
-                privacy_status=privacy_status,
-                publish_at=publish_at,
-            )
-            response.setdefault("title", metadata.title)
-            results.append(response)
-        except Exception as exc:
-            logger.error(
-                "Upload skipped due to validation error",
-                extra={"title": entry.get("title"), "error": str(exc)},
-            )
-            results.append({
-                "title": str(entry.get("title", "")),
-                "status": "failed",
-                "reason": str(exc),
-            })
-        finally:
-            _cleanup_artifacts(entry)
+    upload_one = partial(
+        _upload_entry,
+        settings=settings,
+        category_id=category_id,
+        privacy_status_default=privacy_status_default,
+        default_tags=default_tags,
+        now_utc=now_utc,
+        force_inspect=_force_inspect_from_env() if force_inspect is None else force_inspect,
+    )
+    workers = min(_upload_concurrency(), len(items))
+    if workers > 1:
+        # Загрузки упираются в сеть, поэтому потоки дают почти линейный выигрыш;
+        # map сохраняет порядок результатов как в манифесте.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            results = list(pool.map(upload_one, items))
+    else:
+        results = [upload_one(entry) for entry in items]
 
     return results
 
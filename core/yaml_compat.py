@@ -0,0 +1,38 @@
+"""YAML helpers that use libyaml's C loader/dumper when PyYAML was built with it.
+
+``yaml.safe_load``/``yaml.safe_dump`` always go through the pure-Python
+implementation; the ``CSafe*`` classes accept the same documents and are several
+times faster. ``YAML_LOADER=python`` forces the pure-Python classes.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, IO
+
+import yaml
+
+
+def _select(c_name: str, fallback: type) -> type:
+    if os.getenv("YAML_LOADER", "").strip().lower() in {"python", "safe", "pure"}:
+        return fallback
+    return getattr(yaml, c_name, fallback)
+
+
+SafeLoader: type = _select("CSafeLoader", yaml.SafeLoader)
+SafeDumper: type = _select("CSafeDumper", yaml.SafeDumper)
+
+
+def safe_load(stream: str | bytes | IO[Any]) -> Any:
+    """Parse a YAML document with :data:`SafeLoader`."""
+
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_dump(data: Any, stream: IO[Any] | None = None, **kwargs: Any) -> Any:
+    """Serialise ``data`` with :data:`SafeDumper`; accepts ``yaml.dump`` keyword arguments."""
+
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
+
+
+__all__ = ["SafeDumper", "SafeLoader", "safe_dump", "safe_load"]
@@ -1,46 +1,53 @@
+from functools import lru_cache
 from pathlib import Path
 import random
 
+HOOKS = (
+    "Luxury bed vs cardboard box. Guess what wins?",
+    "Today: the red dot files a complaint.",
+    "Three alarms vs one very lazy cat.",
+    "Bossfight: vacuum cleaner with low battery.",
+)
+SETUPS = (
+    "Iris brings a fancy bed. Plombir inspects it like a critic.",
+    "Cashback the hamster claims he found a *deal*. It's a box.",
+    "Three alarms ring. Plombir has a plan.",
+)
+TWISTS = (
+    "A wrinkled box appears. First class dive.",
+    "The laser stops. Plombir freezes—it's behind him.",
+    "Alarm one: paw. Two: tail. Three: nose.",
+    "Hamster pulls the plug from the vacuum. Tactical victory!",
+)
+PUNCHES = (
+    "Iris: It's not a box. It's Box Edition.",
+    "Plombir: I wasn't scared. I was charging.",
+    "Made it by lunch. Perfect schedule.",
+)
+PICK_POINTS = (
+    ("AMOLED 120Hz under $300", "5000 mAh battery+", "2 years of updates minimum"),
+    ("Best camera under $400", "OIS matters more than 108 MP", "Balanced SoC over raw clocks"),
+)
+
+@lru_cache(maxsize=4)
+def _tpl(name: str) -> str:
+    # Шаблоны читаем с диска один раз на процесс, а не на каждый сценарий.
+    return Path(name).read_text(encoding="utf-8")
+
 def gen_cats(title: str) -> str:
-    T = Path("templates/script_template_en.md").read_text(encoding="utf-8")
-    hooks = [
-        "Luxury bed vs cardboard box. Guess what wins?",
-        "Today: the red dot files a complaint.",
-        "Three alarms vs one very lazy cat.",
-        "Bossfight: vacuum cleaner with low battery.",
-    ]
-    setups = [
-        "Iris brings a fancy bed. Plombir inspects it like a critic.",
-        "Cashback the hamster claims he found a *deal*. It's a box.",
-        "Three alarms ring. Plombir has a plan.",
-    ]
-    twists = [
-        "A wrinkled box appears. First class dive.",
-        "The laser stops. Plombir freezes—it's behind him.",
-        "Alarm one: paw. Two: tail. Three: nose.",
-        "Hamster pulls the plug from the vacuum. Tactical victory!",
-    ]
-    punches = [
-        "Iris: It's not a box. It's Box Edition.",
-        "Plombir: I wasn't scared. I was charging.",
-        "Made it by lunch. Perfect schedule.",
-    ]
+    T = _tpl("templates/script_template_en.md")
     data = {
         "title": title,
-        "hook": random.choice(hooks),
-        "setup": random.choice(setups),
-        "twist": random.choice(twists),
-        "punch": random.choice(punches),
+        "hook": random.choice(HOOKS),
+        "setup": random.choice(SETUPS),
+        "twist": random.choice(TWISTS),
+        "punch": random.choice(PUNCHES),
     }
     return T.format(**data)
 
 def gen_picks(title: str) -> str:
-    T = Path("templates/script_template_pick_en.md").read_text(encoding="utf-8")
-    pts = [
-        ["AMOLED 120Hz under $300", "5000 mAh battery+", "2 years of updates minimum"],
-        ["Best camera under $400", "OIS matters more than 108 MP", "Balanced SoC over raw clocks"],
-    ]
-    p = random.choice(pts)
+    T = _tpl("templates/script_template_pick_en.md")
+    p = random.choice(PICK_POINTS)
     return T.format(title=title, p1=p[0], p2=p[1], p3=p[2])
 
 def generate_script(title: str, mode: str) -> str:
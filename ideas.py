@@ -1,33 +1,91 @@
 # ruff: noqa
 
-import os, json, time, math
-from datetime import datetime, timezone
+import asyncio, os, re, threading, time, math
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
 from typing import List, Dict, Any
 import httpx
 
+from core import json_compat
+from core.atomic_io import atomic_write_bytes
+from core.bloom import BloomFilter
+
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY", "")
 DATA_DIR = os.getenv("DATA_DIR", "data")
+# Очередь идей: JSONL (первая строка — заголовок, дальше по идее на строку)
+# + файл-указатель головы со смещением в байтах, чтобы pop_n не переписывал всю очередь.
+QUEUE_FILE = os.path.join(DATA_DIR, "ideas.jsonl")
+HEAD_FILE = os.path.join(DATA_DIR, "ideas.head")
+# Старый формат (один JSON-документ) — читается, пока нет QUEUE_FILE.
 IDEAS_FILE = os.path.join(DATA_DIR, "ideas.queue.json")
+# Сиды уже выданных через pop_n идей — чтобы не предлагать их снова в следующие дни.
+SEEN_SEEDS_FILE = os.path.join(DATA_DIR, "seen_seeds.bloom")
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
+try:  # межпроцессная блокировка очереди (нет на Windows — там хватает потоковой)
+    import fcntl
+except ImportError:  # pragma: no cover - platform specific
+    fcntl = None
+
+_QUEUE_LOCK = threading.Lock()
+
+try:  # потоковый разбор больших ответов reddit — опционально
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+
+# Ответы reddit крупнее этого разбираем потоково (если есть ijson), иначе целиком.
+_REDDIT_STREAM_MIN_BYTES = 200_000
+_REDDIT_POST = "data.children.item.data"
+_REDDIT_FIELDS = {f"{_REDDIT_POST}.{k}": k for k in ("title", "score", "permalink")}
+
+try:  # HTTP/2 в httpx требует пакет h2 (extra httpx[http2])
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Общий клиент на процесс: keep-alive соединения переживают вызовы refresh_ideas,
+# и повторные запросы к googleapis/reddit не платят за TCP+TLS заново.
+_CLIENT: httpx.AsyncClient | None = None
+
+
+REDDIT_SUBS = ("aww", "cats", "Catmemes", "AnimalsBeingDerps")
+# Не больше стольких одновременных запросов к внешним API за один refresh.
+_FETCH_CONCURRENCY = 8
+
+
+async def get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+            http2=_HTTP2,
+            timeout=30,
+        )
+    return _CLIENT
+
+
+async def aclose_client() -> None:
+    """Close the shared HTTP client; call from the app's shutdown hook."""
+    global _CLIENT
+    client, _CLIENT = _CLIENT, None
+    if client is not None:
+        await client.aclose()
+
+
 # --- Helpers ---
+_DUR_RE = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+
 def _sec_from_iso8601_dur(dur: str) -> int:
     # e.g. PT0M42S, PT1M5S, PT59S
-    if not dur or not dur.startswith("PT"): return 999999
-    s = 0
-    num = ""
-    for ch in dur[2:]:
-        if ch.isdigit():
-            num += ch
-            continue
-        if ch == "H":
-            s += int(num) * 3600; num = ""
-        elif ch == "M":
-            s += int(num) * 60; num = ""
-        elif ch == "S":
-            s += int(num); num = ""
-    return s
+    m = _DUR_RE.fullmatch(dur or "")
+    if not m: return 999999
+    h, mi, s = m.groups()
+    return int(h or 0) * 3600 + int(mi or 0) * 60 + int(s or 0)
 
 
 def _safe_int(x, default=0):
@@ -42,7 +100,8 @@ def _like_rate(stats: Dict[str, Any]) -> float:
 
 
 def _now_iso():
-    return datetime.now(timezone.utc).isoformat()
+    # UTC с суффиксом "Z", как в расписании; strftime по gmtime дешевле datetime.now().isoformat()
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
 # --- Sources: YouTube mostPopular (shorts only), Google Trends, Reddit JSON ---
@@ -56,6 +115,8 @@ async def _yt_most_popular(client: httpx.AsyncClient, region: str, category_id:
         "regionCode": region,
         "videoCategoryId": category_id,
         "maxResults": max_results,
+        # partial response: только поля, которые ниже реально читаем
+        "fields": "items(id,snippet(title,tags),contentDetails/duration,statistics(viewCount,likeCount))",
         "key": YOUTUBE_API_KEY,
     }
     r = await client.get("https://www.googleapis.com/youtube/v3/videos", params=params, timeout=30)
@@ -89,10 +150,8 @@ async def _reddit_top_daily(client: httpx.AsyncClient, sub: str, limit=50) -> Li
     r = await client.get(url, params=params, headers={"User-Agent": "trend-bot/1.0"}, timeout=30)
     if r.status_code >= 400:
         return []
-    data = r.json()
     out = []
-    for ch in data.get("data", {}).get("children", []):
-        d = ch.get("data", {})
+    for d in _reddit_posts(r.content):
         title = d.get("title", "")
         score = d.get("score", 0)
         if not title: continue
@@ -106,17 +165,32 @@ async def _reddit_top_daily(client: httpx.AsyncClient, sub: str, limit=50) -> Li
     return out
 
 
-def _hashtags(base_words: List[str], extra: List[str]=[]) -> List[str]:
-    uniq = []
-    for w in (base_words + extra):
-        h = "#" + w.lower().replace(" ", "")
-        if h not in uniq:
-            uniq.append(h)
-    # добавим базовые
-    for h in ["#shorts", "#viral", "#trending"]:
-        if h not in uniq:
-            uniq.append(h)
-    return uniq[:12]
+def _reddit_posts(raw: bytes) -> List[Dict[str, Any]]:
+    """Return the ``data`` dict of every post in a reddit listing response."""
+    if ijson is None or len(raw) < _REDDIT_STREAM_MIN_BYTES:
+        data = json_compat.loads(raw)
+        return [ch.get("data", {}) for ch in data.get("data", {}).get("children", [])]
+    # Собираем только нужные ключи: превью, награды и медиа не материализуются.
+    posts: List[Dict[str, Any]] = []
+    for prefix, event, value in ijson.parse(raw):
+        if prefix == _REDDIT_POST and event == "start_map":
+            posts.append({})
+        elif prefix in _REDDIT_FIELDS and posts:
+            posts[-1][_REDDIT_FIELDS[prefix]] = value
+    return posts
+
+
+_BASE_HASHTAGS = ("#shorts", "#viral", "#trending")
+
+
+def _hashtags(base_words: List[str], extra: List[str]=()) -> List[str]:
+    # dict.fromkeys — дедуп с сохранением порядка; в конце добавим базовые
+    tags = chain(("#" + w.lower().replace(" ", "") for w in chain(base_words, extra)), _BASE_HASHTAGS)
+    return list(dict.fromkeys(tags))[:12]
+
+
+# Набор тегов у всех идей одинаковый — считаем один раз при импорте.
+DEFAULT_HASHTAGS = tuple(_hashtags(["cats", "funny cats", "kitten", "memes"]))
 
 
 def _title_from_seed(seed: str) -> str:
@@ -138,21 +212,22 @@ def _script_for_cat_meme(seed: str) -> str:
 
 async def refresh_ideas(regions=("US","GB","CA","KZ"), categories=("15","24")) -> Dict[str, Any]:
     # 15 = Pets & Animals, 24 = Entertainment
+    client = await get_client()
+    sem = asyncio.Semaphore(_FETCH_CONCURRENCY)
+
+    async def limited(coro):
+        async with sem:
+            return await coro
+
+    # YouTube trending shorts + Reddit top daily for aww/cats — все запросы разом;
+    # gather сохраняет порядок, так что итог тот же, что при последовательных await.
+    tasks = [_yt_most_popular(client, rg, cat) for rg in regions for cat in categories]
+    tasks += [_reddit_top_daily(client, sub) for sub in REDDIT_SUBS]
+    results = await asyncio.gather(*(limited(t) for t in tasks), return_exceptions=True)
     out: List[Dict] = []
-    async with httpx.AsyncClient() as client:
-        # YouTube trending shorts
-        for rg in regions:
-            for cat in categories:
-                try:
-                    out.extend(await _yt_most_popular(client, rg, cat))
-                except Exception:
-                    pass
-        # Reddit top daily for aww/cats
-        for sub in ["aww", "cats", "Catmemes", "AnimalsBeingDerps"]:
-            try:
-                out.extend(await _reddit_top_daily(client, sub))
-            except Exception:
-                pass
+    for r in results:
+        if isinstance(r, list):  # исключения источников просто пропускаем
+            out.extend(r)
 
     # нормализуем в "идею" (seed -> title/script/hashtags)
     seeds: List[str] = []
@@ -165,14 +240,15 @@ async def refresh_ideas(regions=("US","GB","CA","KZ"), categories=("15","24")) -
             seeds.append(it.get("title",""))
 
     # дедуп по нижнему регистру
-    seen = set()
-    uniq_seeds = []
+    # + пропускаем то, что уже уходило в работу (Bloom-фильтр, редкие ложные срабатывания допустимы)
+    # Сначала схлопываем дубли (dict хранит первое вхождение и порядок),
+    # и только уникальные ключи проверяем в фильтре — он дороже set.
+    first: Dict[str, str] = {}
     for s in seeds:
-        k = (s or "").strip().lower()
-        if not k: continue
-        if k in seen: continue
-        seen.add(k)
-        uniq_seeds.append(s.strip())
+        if k := (s or "").strip().lower():
+            first.setdefault(k, s)
+    posted = await asyncio.to_thread(BloomFilter.load, SEEN_SEEDS_FILE)
+    uniq_seeds = [s.strip() for k, s in first.items() if k not in posted]
 
     # берём топ N по простым эвристикам (длина, "cat" в тексте и т.д.)
     scored = []
@@ -188,7 +264,7 @@ async def refresh_ideas(regions=("US","GB","CA","KZ"), categories=("15","24")) -
     ideas = []
     for _, seed in scored[:60]:  # оставим топ-60 на сутки
         title = _title_from_seed(seed)
-        hashtags = _hashtags([ "cats", "funny cats", "kitten", "memes" ])
+        hashtags = list(DEFAULT_HASHTAGS)
         script = _script_for_cat_meme(seed)
         ideas.append({
             "seed": seed,
@@ -209,23 +285,103 @@ async def refresh_ideas(regions=("US","GB","CA","KZ"), categories=("15","24")) -
         "count": len(ideas),
         "items": ideas
     }
-    with open(IDEAS_FILE, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    # Запись (и ожидание блокировки очереди) — в потоке, чтобы не держать event loop.
+    await asyncio.to_thread(_write_ideas, payload)
     return payload
 
 
-def load_ideas() -> Dict[str, Any]:
-    if not os.path.exists(IDEAS_FILE):
+@contextmanager
+def _queue_lock():
+    with _QUEUE_LOCK:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{HEAD_FILE}.lock", "ab") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _write_head(generation: Any, offset: int) -> None:
+    atomic_write_bytes(HEAD_FILE, json_compat.dumps({"generation": generation, "offset": offset}))
+
+
+def _write_queue(payload: Dict[str, Any]) -> None:
+    # json_compat: orjson, если установлен, иначе stdlib json; на выходе UTF-8 байты.
+    generation = str(time.time_ns())
+    header = json_compat.dumps({"generatedAt": payload.get("generatedAt"), "generation": generation})
+    lines = [header, *(json_compat.dumps(it) for it in payload.get("items", []))]
+    atomic_write_bytes(QUEUE_FILE, b"\n".join(lines) + b"\n")
+    _write_head(generation, len(header) + 1)
+
+
+def _write_ideas(payload: Dict[str, Any]) -> None:
+    with _queue_lock():
+        _write_queue(payload)
+
+
+def _queue_position(fh) -> tuple[Dict[str, Any], int]:
+    """Read the queue header from ``fh`` and return it with the head offset."""
+    first = fh.readline()
+    header = json_compat.loads(first) if first.strip() else {}
+    start = len(first)
+    try:
+        head = json_compat.loads(Path(HEAD_FILE).read_bytes())
+    except (FileNotFoundError, json_compat.JSONDecodeError):
+        return header, start
+    offset = head.get("offset")
+    # Указатель от другой генерации очереди (refresh между записями) — начинаем сначала.
+    if head.get("generation") != header.get("generation") or not isinstance(offset, int) or offset < start:
+        return header, start
+    return header, offset
+
+
+def _load_legacy_ideas() -> Dict[str, Any]:
+    try:
+        raw = Path(IDEAS_FILE).read_bytes()
+    except FileNotFoundError:
         return {"generatedAt": None, "count": 0, "items": []}
-    return json.loads(open(IDEAS_FILE, "r", encoding="utf-8").read())
+    return json_compat.loads(raw)
+
+
+def load_ideas() -> Dict[str, Any]:
+    try:
+        fh = open(QUEUE_FILE, "rb")
+    except FileNotFoundError:
+        return _load_legacy_ideas()
+    with fh:
+        header, offset = _queue_position(fh)
+        fh.seek(offset)
+        items = [json_compat.loads(line) for line in fh if line.strip()]
+    return {"generatedAt": header.get("generatedAt"), "count": len(items), "items": items}
 
 
 def pop_n(n=1) -> List[Dict[str,Any]]:
-    data = load_ideas()
-    items = data.get("items", [])
-    take = items[:max(0, n)]
-    data["items"] = items[len(take):]
-    data["count"] = len(data["items"])
-    with open(IDEAS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    take: List[Dict[str, Any]] = []
+    with _queue_lock():
+        if not os.path.exists(QUEUE_FILE):
+            legacy = _load_legacy_ideas()
+            if not legacy.get("items"):
+                return take
+            _write_queue(legacy)  # разовая миграция из ideas.queue.json
+        with open(QUEUE_FILE, "rb") as fh:
+            header, offset = _queue_position(fh)
+            fh.seek(offset)
+            while len(take) < n:
+                line = fh.readline()
+                if not line:
+                    break
+                if line.strip():
+                    take.append(json_compat.loads(line))
+            new_offset = fh.tell()
+        if new_offset != offset:
+            _write_head(header.get("generation"), new_offset)
+        if take:
+            # Под той же блокировкой: load→add→save фильтра иначе теряет сиды соседних pop.
+            posted = BloomFilter.load(SEEN_SEEDS_FILE)
+            for it in take:
+                posted.add(str(it.get("seed", "")).strip().lower())
+            posted.save(SEEN_SEEDS_FILE)
     return take
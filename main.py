@@ -1,7 +1,9 @@
 # main.py — минимальный FastAPI с веб-OAuth для Render
 import asyncio
-import json
+import html
 import os
+import threading
+from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
@@ -9,10 +11,17 @@ from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import Flow
 
 from config import settings
-from core.env_compat import OAuthConfigError, ensure_inline_oauth_env, get_oauth_client_config
+from core.env_compat import (
+    OAuthConfigError,
+    ensure_inline_oauth_env,
+    get_oauth_client_config,
+    load_authorized_user_info,
+)
+from core import json_compat
+from core.orjson_response import ORJSONResponse
 from upload_youtube import UploadConfigurationError, get_credentials
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 ensure_inline_oauth_env()
 
@@ -25,14 +34,33 @@ except Exception:  # pragma: no cover - httpx missing locally is OK
 import ideas  # noqa: E402
 
 
+# httplib2 внутри googleapiclient не потокобезопасен, а сервис теперь общий.
+_YT_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _yt_service(token_key: tuple[str | None, str | None]):
+    # Ключ — (client_id, refresh_token): пока токен в окружении тот же, discovery-документ
+    # не разбирается заново, а access token обновляется самими credentials.
+    return build("youtube", "v3", credentials=get_credentials(), cache_discovery=False, static_discovery=True)
+
+
+def _get_yt_service():
+    try:
+        info = load_authorized_user_info()
+    except OAuthConfigError as exc:
+        raise UploadConfigurationError(str(exc)) from exc
+    return _yt_service((info.get("client_id"), info.get("refresh_token")))
+
+
 @app.get("/auth/whoami")
 def whoami():
     """Return channel metadata for the current OAuth credentials."""
 
     try:
-        creds = get_credentials()
-        yt = build("youtube", "v3", credentials=creds)
-        me = yt.channels().list(part="id,snippet,statistics", mine=True).execute()
+        yt = _get_yt_service()
+        with _YT_LOCK:
+            me = yt.channels().list(part="id,snippet,statistics", mine=True).execute()
         return {"ok": True, "me": me}
     except UploadConfigurationError as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -70,24 +98,44 @@ async def _internal_keepalive() -> None:
     if not settings.PING_URL or not httpx:
         return
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        while True:
-            try:
-                await client.get(settings.PING_URL)
-            except Exception:  # pragma: no cover - best-effort ping
-                pass
-            await asyncio.sleep(300)
+    while True:
+        try:
+            # Общий пул из ideas: отдельный клиент держал бы ещё одно соединение и TLS-сессию.
+            client = await ideas.get_client()
+            await client.get(settings.PING_URL, timeout=10)
+        except Exception:  # pragma: no cover - best-effort ping
+            pass
+        await asyncio.sleep(300)
+
+
+_KEEPALIVE_TASK: asyncio.Task | None = None
 
 
 @app.on_event("startup")
 async def _maybe_start_keepalive() -> None:
     """Schedule keep-alive task without breaking existing startup logic."""
 
+    global _KEEPALIVE_TASK
     try:
-        asyncio.create_task(_internal_keepalive())
+        # Ссылку держим: иначе задачу может собрать GC, и её нужно отменить на shutdown.
+        _KEEPALIVE_TASK = asyncio.create_task(_internal_keepalive())
     except Exception:  # pragma: no cover - scheduler safety net
         pass
 
+@app.on_event("shutdown")
+async def _close_ideas_client() -> None:
+    """Stop the keep-alive loop and release the shared HTTP client's connections."""
+
+    global _KEEPALIVE_TASK
+    task, _KEEPALIVE_TASK = _KEEPALIVE_TASK, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await ideas.aclose_client()
+
 SCOPES = [os.getenv("YOUTUBE_SCOPES", "https://www.googleapis.com/auth/youtube.upload")]
 
 def _cb_url(req: Request) -> str:
@@ -128,7 +176,8 @@ def oauth_callback(request: Request):
         "client_secret": c.client_secret,
         "scopes": list(c.scopes or []),
     }
-    pretty = json.dumps(token_json, ensure_ascii=False, indent=2)
+    # Экранируем: значения приходят от OAuth-провайдера и вставляются в HTML.
+    pretty = html.escape(json_compat.dumps(token_json, indent=True).decode("utf-8"), quote=False)
     return f"<h2>Готово ✅ Скопируй JSON в Render → Environment → YOUTUBE_TOKEN_JSON</h2><pre>{pretty}</pre>"
 
 
@@ -1,5 +1,32 @@
 
 import argparse, json, os, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+try:  # optional: faster JSONL parse/dump
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads  # обе принимают bytes
+
+def _render_one(job, args, threads):
+    idx, j = job
+    base = f"{idx:02d}_" + j["title"].strip().replace(" ", "_")[:40]
+    script_path = os.path.join(args.outdir, base + ".json")
+    wav_path = os.path.join(args.outdir, base + ".wav")
+    mp4_path = os.path.join(args.outdir, base + ".mp4")
+
+    if orjson is not None:
+        payload = orjson.dumps(j, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(j, ensure_ascii=False, indent=2).encode("utf-8")
+    with open(script_path, "wb") as fh:
+        fh.write(payload)
+
+    subprocess.check_call([sys.executable, "scripts/tts_piper.py", "--script_json", script_path, "--voice", args.voice, "--out", wav_path])
+    subprocess.check_call([sys.executable, "scripts/render_short.py", "--script", script_path, "--voice", wav_path, "--bg", args.bg, "--music", args.music, "--out", mp4_path, "--threads", str(threads)])
+    print("DONE:", mp4_path, flush=True); time.sleep(0.1)
+    return mp4_path
 
 def main():
     p = argparse.ArgumentParser()
@@ -8,25 +35,23 @@ def main():
     p.add_argument("--bg", required=True)
     p.add_argument("--music", default="")
     p.add_argument("--outdir", required=True)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Videos rendered in parallel")
     args = p.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
 
-    with open(args.jsonl, encoding="utf-8") as f:
-        for idx, line in enumerate(f, start=1):
-            line = line.strip()
-            if not line: continue
-            j = json.loads(line)
-            base = f"{idx:02d}_" + j["title"].strip().replace(" ", "_")[:40]
-            script_path = os.path.join(args.outdir, base + ".json")
-            wav_path = os.path.join(args.outdir, base + ".wav")
-            mp4_path = os.path.join(args.outdir, base + ".mp4")
-
-            json.dump(j, open(script_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-
-            subprocess.check_call([sys.executable, "scripts/tts_piper.py", "--script_json", script_path, "--voice", args.voice, "--out", wav_path])
-            subprocess.check_call([sys.executable, "scripts/render_short.py", "--script", script_path, "--voice", wav_path, "--bg", args.bg, "--music", args.music, "--out", mp4_path])
-            print("DONE:", mp4_path); time.sleep(0.1)
+    with open(args.jsonl, "rb") as f:
+        jobs = [(idx, _loads(line)) for idx, line in enumerate(f, start=1) if line.strip()]
+    if not jobs:
+        return
+
+    # Работа идёт в дочерних процессах (piper, ffmpeg), поэтому хватает потоков,
+    # которые только ждут subprocess. Ядра делим между рендерами, чтобы
+    # несколько x264 с threads=auto не дрались за одни и те же ядра.
+    workers = max(1, min(args.workers, len(jobs)))
+    threads = 0 if workers == 1 else max(1, (os.cpu_count() or 1) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda job: _render_one(job, args, threads), jobs))
 
 if __name__ == "__main__":
     main()
@@ -1,26 +1,45 @@
-from moviepy.editor import VideoFileClip
-from PIL import Image
-import numpy as np
+import subprocess
 import sys
+from pathlib import Path
+
+import imageio_ffmpeg
+import numpy as np
+from PIL import Image
 
 src = 'build/output_short_ffmpeg_final.mp4'
 out = 'build/frame0.png'
-try:
-    clip = VideoFileClip(src)
-except Exception as e:
-    print('ERROR opening video:', e)
-    sys.exit(2)
 
-frame = clip.get_frame(0.5 if clip.duration>0.5 else 0)
-img = Image.fromarray(frame)
-img.save(out)
+
+def dump_frame(at: str) -> str | None:
+    """Write the frame at ``at`` seconds to ``out``; return ffmpeg's error text on failure."""
+    # Один вызов ffmpeg пишет PNG сразу: без MoviePy, numpy-пайпа и повторного кодирования через PIL.
+    Path(out).unlink(missing_ok=True)
+    result = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'error', '-y', '-ss', at, '-i', src, '-frames:v', '1', out],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode == 0 and Path(out).exists():
+        return None
+    return result.stderr.strip() or 'no frame decoded'
+
+
+# кадр на 0.5 с, а для совсем коротких клипов — первый кадр
+error = dump_frame('0.5') and dump_frame('0')
+if error:
+    print('ERROR opening video:', error)
+    sys.exit(2)
 print('Wrote frame to', out)
+img = Image.open(out)
 arr = np.array(img)
 # downsample sample grid
 sample = arr[::20, ::20]
-# count unique RGB tuples
-unique = set(tuple(pixel) for row in sample for pixel in row)
-print('unique_colors_sample:', len(unique))
+# count unique RGB(A) colours: pack uint8 channels into one uint32 per pixel
+flat = sample.reshape(-1, sample.shape[-1]).astype(np.uint32)
+packed = np.zeros(len(flat), dtype=np.uint32)
+for channel in range(flat.shape[1]):
+    packed = (packed << 8) | flat[:, channel]
+print('unique_colors_sample:', np.unique(packed).size)
 print('mean_rgb:', sample.mean(axis=(0,1)).tolist())
 # compute alpha presence if exists
 if arr.shape[2]==4:
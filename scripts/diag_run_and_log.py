@@ -30,7 +30,7 @@ with open(LOG, 'w', encoding='utf-8') as log:
         # copy script for first topic
         topics = ROOT / 'data' / 'topics_today.jsonl'
         first = None
-        with open(topics, 'r', encoding='utf-8') as f:
+        with open(topics, 'rb') as f:
             for line in f:
                 line=line.strip()
                 if not line: continue
@@ -40,7 +40,11 @@ with open(LOG, 'w', encoding='utf-8') as log:
             log.write('No topics in data/topics_today.jsonl\n')
             raise SystemExit(1)
         import json
-        it = json.loads(first)
+        try:  # optional: orjson parses the bytes line directly
+            from orjson import loads as _loads
+        except ImportError:
+            _loads = json.loads
+        it = _loads(first)
         slug = ''.join([c for c in it['title'].lower().replace(' ','_') if c.isalnum() or c in '._-'])[:60]
         jobdir = ROOT / 'build' / 'test_run' / slug
         jobdir.mkdir(parents=True, exist_ok=True)
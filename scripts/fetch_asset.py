@@ -1,11 +1,21 @@
 import argparse
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import Generator, Iterable, Optional, Tuple
 
 import requests
 import json
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:  # optional: stream large search responses item by item
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
 
 FALLBACK_QUERIES = ["dark texture", "misty forest", "moonlit sky"]
 DEFAULT_ORIENTATION = "vertical"
@@ -15,12 +25,42 @@ PIXABAY_ORIENTATION = {"vertical": "vertical", "horizontal": "horizontal"}
 PHOTO_SIZE_ORDER = ("original", "large2x", "large", "medium", "small")
 VIDEO_SIZE_ORDER = ("large", "medium", "small", "tiny")
 
+# Одна сессия на процесс: поиск и скачивание с того же хоста переиспользуют
+# keep-alive соединение вместо нового TCP+TLS на каждый запрос.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
 
 def log(message: str, *, enabled: bool) -> None:
     if enabled:
         print(message)
 
 
+def iter_json_array(url: str, key: str, *, params: dict, headers: Optional[dict] = None) -> Iterable[dict]:
+    """Yield the objects of the top-level ``key`` array of a JSON response.
+
+    With ijson installed the body is parsed incrementally from the socket, so
+    only one hit is materialised at a time; otherwise the whole response is
+    decoded with ``response.json()``.
+    """
+    if ijson is None:
+        response = _SESSION.get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        yield from response.json().get(key, [])
+        return
+    with _SESSION.get(url, headers=headers, params=params, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True  # gzip/deflate разворачивает urllib3
+        # Битое тело и обрыв сокета при чтении raw — это не RequestException;
+        # заворачиваем их, чтобы провайдер пропускался, как и с response.json().
+        try:
+            yield from ijson.items(response.raw, f"{key}.item")
+        except ijson.JSONError as exc:
+            raise requests.RequestException(f"Invalid JSON from {url}: {exc}") from exc
+        except urllib3.exceptions.HTTPError as exc:
+            raise requests.ConnectionError(exc) from exc
+
+
 def ensure_extension(path: Path, kind: str) -> Path:
     if kind == "photo" and path.suffix.lower() not in {".jpg", ".jpeg", ".png"}:
         return path.with_suffix(".jpg")
@@ -66,12 +106,9 @@ def iter_pexels(
         url = "https://api.pexels.com/videos/search"
 
     log(f"Pexels request: {url} params={params}", enabled=verbose)
-    response = requests.get(url, headers=headers, params=params, timeout=30)
-    response.raise_for_status()
-    data = response.json()
 
     if kind == "photo":
-        for photo in data.get("photos", []):
+        for photo in iter_json_array(url, "photos", params=params, headers=headers):
             width = int(photo.get("width") or 0)
             height = int(photo.get("height") or 0)
             if width < min_width or height < min_height:
@@ -83,7 +120,7 @@ def iter_pexels(
                     yield url_candidate, width, height
                     break
     else:
-        for video in data.get("videos", []):
+        for video in iter_json_array(url, "videos", params=params, headers=headers):
             files = video.get("video_files", [])
             sorted_files = sorted(
                 files,
@@ -149,11 +186,7 @@ def iter_pixabay(
         params["image_type"] = "video"
 
     log(f"Pixabay request: {base_url} params={params}", enabled=verbose)
-    response = requests.get(base_url, params=params, timeout=30)
-    response.raise_for_status()
-    data = response.json()
-
-    hits = data.get("hits", [])
+    hits = iter_json_array(base_url, "hits", params=params)
     if kind == "photo":
         for hit in hits:
             width = int(hit.get("imageWidth") or 0)
@@ -190,7 +223,7 @@ def iter_pixabay(
 def download(url: str, destination: Path, *, verbose: bool) -> None:
     destination.parent.mkdir(parents=True, exist_ok=True)
     log(f"Downloading {url} -> {destination}", enabled=verbose)
-    with requests.get(url, stream=True, timeout=120) as response:
+    with _SESSION.get(url, stream=True, timeout=120) as response:
         response.raise_for_status()
         with destination.open("wb") as fh:
             for chunk in response.iter_content(chunk_size=1 << 15):
@@ -218,6 +251,53 @@ def select_asset(
     return None
 
 
+def _replay_error(exc: Exception) -> Generator[Tuple[str, int, int], None, None]:
+    raise exc
+    yield  # pragma: no cover - makes this a generator
+
+
+def prefetch(
+    fetchers: Iterable,
+    *,
+    min_width: int,
+    min_height: int,
+    stop: threading.Event,
+) -> list:
+    """Run the provider requests now; select_asset later walks the buffered results.
+
+    Reading stops at the first candidate select_asset would accept, so with
+    streaming (ijson) parsing the rest of the response is never downloaded;
+    the candidates before it are kept so they are logged as before. Request
+    errors are captured and re-raised when the result is iterated, after the
+    candidates already read. ``stop`` abandons the search at the next candidate.
+    """
+    buffered = []
+    for fetch in fetchers:
+        if stop.is_set():
+            break
+        seen = []
+        found = False
+        try:
+            for candidate in fetch:
+                seen.append(candidate)
+                _, width, height = candidate
+                found = width >= min_width and height >= min_height
+                if found or stop.is_set():
+                    break
+        except requests.RequestException as exc:
+            buffered.append(chain(seen, _replay_error(exc)))
+            continue
+        finally:
+            # Закрываем генератор, чтобы сразу отпустить недочитанный ответ.
+            close = getattr(fetch, "close", None)
+            if close is not None:
+                close()
+        buffered.append(seen)
+        if found:
+            break
+    return buffered
+
+
 def build_fetchers(
     provider: str,
     query: str,
@@ -284,23 +364,47 @@ def main() -> None:
     queries = [args.query] + FALLBACK_QUERIES
     output_path = ensure_extension(Path(args.out), args.kind)
 
-    for query in queries:
-        log(f"Searching for '{query}'", enabled=args.verbose)
-        for provider in providers:
-            log(f"Provider: {provider}", enabled=args.verbose)
-            fetchers = build_fetchers(provider, query, args=args)
-            asset = select_asset(
-                fetchers,
-                min_width=args.min_width,
-                min_height=args.min_height,
-                verbose=args.verbose,
-            )
-            if asset:
-                url, width, height = asset
-                log(f"Selected {width}x{height} asset from {provider}", enabled=args.verbose)
-                download(url, output_path, verbose=args.verbose)
-                print(str(output_path))
-                return
+    # Поиск у всех провайдеров одного запроса идёт параллельно, а выбор — по-прежнему
+    # в порядке приоритета: ждём результат провайдера, только когда до него дошла очередь.
+    pool = ThreadPoolExecutor(max_workers=len(providers))
+    stop = threading.Event()
+    try:
+        for query in queries:
+            log(f"Searching for '{query}'", enabled=args.verbose)
+            pending = [
+                (
+                    provider,
+                    pool.submit(
+                        prefetch,
+                        build_fetchers(provider, query, args=args),
+                        min_width=args.min_width,
+                        min_height=args.min_height,
+                        stop=stop,
+                    ),
+                )
+                for provider in providers
+            ]
+            for provider, future in pending:
+                log(f"Provider: {provider}", enabled=args.verbose)
+                asset = select_asset(
+                    future.result(),
+                    min_width=args.min_width,
+                    min_height=args.min_height,
+                    verbose=args.verbose,
+                )
+                if asset:
+                    stop.set()
+                    url, width, height = asset
+                    log(f"Selected {width}x{height} asset from {provider}", enabled=args.verbose)
+                    download(url, output_path, verbose=args.verbose)
+                    print(str(output_path))
+                    return
+    finally:
+        # Ещё не начатые поиски отменяются, а идущие бросают чтение на следующем
+        # кандидате. Поток, который ждёт ответа сервера, досиживает до таймаута
+        # запроса (30 с), и выход из интерпретатора его дожидается.
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
     print("NO_RESULTS")
     sys.exit(2)
@@ -1,12 +1,32 @@
 # -*- coding: utf-8 -*-
-import os, re, json, time, math, hashlib, argparse, pathlib, random, logging
+import os, re, json, time, math, heapq, hashlib, argparse, pathlib, random, logging
 from urllib.parse import quote_plus
 import requests
+from requests.adapters import HTTPAdapter
+try:  # optional: stream large provider responses
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
+try:  # optional: fast non-cryptographic hash for dedup
+    import xxhash
+except ImportError:  # pragma: no cover - optional dependency
+    xxhash = None
+try:  # optional: libvips resize/crop for stock photos
+    import pyvips
+except (ImportError, OSError):  # pragma: no cover - optional dependency (OSError: no libvips)
+    pyvips = None
 from PIL import Image
 from io import BytesIO
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
 TIMEOUT = 20
+# Сколько файлов качаем одновременно (загрузки упираются в сеть, не в CPU).
+DOWNLOAD_WORKERS = 8
 HEADERS = {"User-Agent": "Dark&Strange/1.0"}
+# Общая сессия: keep-alive к api.pexels.com/pixabay.com; пул не меньше DOWNLOAD_WORKERS.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
 LOG = logging.getLogger("fetch_assets")
 if not LOG.handlers:
     logging.basicConfig(level=logging.INFO)
@@ -15,27 +35,35 @@ a an the and or of on in to from for with by at as is are was were be being been
 this that those these it its they them he she we you i not no yes do did done
 over under between into onto out up down left right near far old new one two three four five
 """.split())
+_NONALNUM = re.compile(r"[^A-Za-z0-9\s-]")
+_WORD_RE = re.compile(r"\s+")
 
-def sha1(b: bytes) -> str: return hashlib.sha1(b).hexdigest()
+def content_digest(b: bytes) -> str:
+    # Только для дедупа скачанного: xxh3 при наличии, иначе sha1 (на x86 с SHA-NI быстрее blake2b)
+    if xxhash is not None: return xxhash.xxh3_128_hexdigest(b)
+    return hashlib.sha1(b).hexdigest()
 def ensure_dir(p): pathlib.Path(p).mkdir(parents=True, exist_ok=True)
 
 def keywords_from_script(script_json, topk=6):
-    data = json.load(open(script_json, "r", encoding="utf-8"))
+    with open(script_json, "r", encoding="utf-8") as f:
+        data = json.load(f)
     text = " ".join([data.get("title","")] + data.get("lines", []))
-    text = re.sub(r"[^A-Za-z0-9\s-]", " ", text).lower()
-    words = [w for w in re.split(r"\s+", text) if w and w not in STOP and len(w) > 3]
-    counts = {}
-    for w in words: counts[w] = counts.get(w,0)+1
-    seeds = [w for w,_ in sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:topk]]
+    text = _NONALNUM.sub(" ", text).lower()
+    words = [w for w in _WORD_RE.split(text) if w and w not in STOP and len(w) > 3]
+    # Counter считает в C; nsmallest выбирает top-k без полной сортировки.
+    # most_common() не годится: при равных частотах он держит порядок появления,
+    # а сиды должны идти по алфавиту, как раньше.
+    counts = Counter(words)
+    seeds = [w for w,_ in heapq.nsmallest(topk, counts.items(), key=lambda x: (-x[1], x[0]))]
     for extra in ["horror","haunted","mystery","forest","night","abandoned","legend","ghost","bridge"]:
         if extra not in seeds: seeds.append(extra)
     return seeds[:max(topk, 6)]
 
-def _get(url, headers=None, params=None, api_key=None):
+def _get(url, headers=None, params=None, api_key=None, stream=False):
     h = dict(HEADERS)
     if headers: h.update(headers)
     if api_key: h["Authorization"] = api_key
-    r = requests.get(url, headers=h, params=params, timeout=TIMEOUT)
+    r = _SESSION.get(url, headers=h, params=params, timeout=TIMEOUT, stream=stream)
     r.raise_for_status()
     return r
 
@@ -66,7 +94,13 @@ def _get_with_retries(url, headers=None, params=None, api_key=None, max_retries=
 
 
 
+# Кеш ответов провайдеров на диске (24 ч); FETCH_ASSETS_CACHE=0 отключает его.
+CACHE_ENABLED = os.getenv("FETCH_ASSETS_CACHE", "1").strip() != "0"
+
+
 def _cache_get(cache_dir, key):
+    if not CACHE_ENABLED:
+        return None
     p = pathlib.Path(cache_dir)
     p.mkdir(parents=True, exist_ok=True)
     fn = p / (quote_plus(key) + '.json')
@@ -81,6 +115,8 @@ def _cache_get(cache_dir, key):
 
 
 def _cache_set(cache_dir, key, data):
+    if not CACHE_ENABLED:
+        return
     p = pathlib.Path(cache_dir)
     p.mkdir(parents=True, exist_ok=True)
     fn = p / (quote_plus(key) + '.json')
@@ -91,6 +127,10 @@ def _cache_set(cache_dir, key, data):
 
 def fetch_pexels_photos(q, key, per_page=8):
     if not key: return []
+    cache_key = f'pexels_photos::{q}::{per_page}'
+    cached = _cache_get('.cache/pexels', cache_key)
+    if cached is not None:
+        return cached
     url = "https://api.pexels.com/v1/search"
     r = _get(url, params={"query": q, "per_page": per_page, "orientation": "portrait"}, api_key=key)
     items = []
@@ -99,10 +139,15 @@ def fetch_pexels_photos(q, key, per_page=8):
         if src:
             items.append(dict(kind="image", url=src, source="pexels", id=str(ph["id"]),
                               author=ph.get("photographer"), license="Pexels License"))
+    _cache_set('.cache/pexels', cache_key, items)
     return items
 
 def fetch_pexels_videos(q, key, per_page=6):
     if not key: return []
+    cache_key = f'pexels_videos::{q}::{per_page}'
+    cached = _cache_get('.cache/pexels', cache_key)
+    if cached is not None:
+        return cached
     url = "https://api.pexels.com/videos/search"
     r = _get(url, params={"query": q, "per_page": per_page}, api_key=key)
     items = []
@@ -114,6 +159,7 @@ def fetch_pexels_videos(q, key, per_page=6):
             items.append(dict(kind="video", url=best["link"], source="pexels", id=str(v["id"]),
                               width=best.get("width"), height=best.get("height"),
                               license="Pexels License"))
+    _cache_set('.cache/pexels', cache_key, items)
     return items
 
 def fetch_pixabay(q, key, per_page=8):
@@ -289,14 +335,27 @@ def combined_search(q, pexels_key=None, pixabay_key=None, want=10, want_videos=3
     out = videos[:want_videos] + images[:max(0, want - len(videos))]
     return out
 
+def _commons_pages(url, params):
+    # С ijson страницы (вместе с extmetadata) разбираются по одной прямо из сокета.
+    if ijson is None:
+        data = _get(url, params=params).json().get("query", {}).get("pages", {}) or {}
+        yield from data.values()
+        return
+    with _get(url, params=params, stream=True) as r:
+        r.raw.decode_content = True
+        for _, pg in ijson.kvitems(r.raw, "query.pages"):
+            yield pg
+
 def fetch_commons(q, per_page=6):
+    cache_key = f'commons::{q}::{per_page}'
+    cached = _cache_get('.cache/commons', cache_key)
+    if cached is not None:
+        return cached
     url = "https://commons.wikimedia.org/w/api.php"
     params = {"action":"query","generator":"search","gsrsearch":q+" filetype:bitmap","gsrlimit":str(per_page),
               "prop":"imageinfo","iiprop":"url|size|mime|extmetadata","format":"json","origin":"*"}
-    r = _get(url, params=params)
-    data = r.json().get("query", {}).get("pages", {}) or {}
     items = []
-    for _,pg in data.items():
+    for pg in _commons_pages(url, params):
         ii = (pg.get("imageinfo") or [{}])[0]
         url_i = ii.get("url")
         if not url_i: continue
@@ -304,25 +363,60 @@ def fetch_commons(q, per_page=6):
         if min(w,h) < 1080: continue
         lic = (ii.get("extmetadata",{}).get("LicenseShortName",{}) or {}).get("value","Commons")
         items.append(dict(kind="image", url=url_i, source="wikimedia", id=str(pg.get("pageid")), license=lic))
+    _cache_set('.cache/commons', cache_key, items)
     return items
 
 def download_to(url, out_path):
+    """Save ``url`` to ``out_path``; return ``(out_path, digest)`` or None for an empty body."""
     r = _get(url)
     data = r.content
     if len(data) < 100: return None
     pathlib.Path(out_path).parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "wb") as f: f.write(data)
-    return out_path
+    # Хешируем байты, которые уже в памяти, — без повторного чтения файла.
+    return out_path, content_digest(data)
+
+def _item_ext(item):
+    url = item["url"]
+    ext = ".mp4" if item["kind"] == "video" else os.path.splitext(url.split("?")[0])[1].lower()
+    if ext not in (".jpg",".jpeg",".png",".mp4",".mov",".webm",".mkv",".m4v"):
+        ext = ".jpg" if item["kind"]=="image" else ".mp4"
+    return ext
+
+def _vips_crop(path, min_w, min_h):
+    # thumbnail сливает декод, масштаб и кроп в один потоковый конвейер.
+    # size="up" — как и в PIL-ветке ниже: большие фото не уменьшаем, только режем
+    # центр, маленькие растягиваем до покрытия кадра.
+    im = pyvips.Image.thumbnail(path, min_w, height=min_h, size="up", crop="centre", no_rotate=True)
+    im = im.colourspace("srgb")
+    if im.hasalpha(): im = im.extract_band(0, n=3)
+    # Исходник читается лениво, поэтому пишем во временный файл рядом и подменяем.
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.vips{ext}"
+    if ext.lower() in (".jpg", ".jpeg"):
+        im.jpegsave(tmp, Q=95, subsample_mode="on")
+    else:
+        im.write_to_file(tmp)
+    os.replace(tmp, path)
 
 def vertical_crop_if_needed(path, min_w=1080, min_h=1920):
     if path.lower().endswith((".mp4",".mov",".mkv",".webm",".m4v")): return
-    im = Image.open(path).convert("RGB")
+    if pyvips is not None:
+        try:
+            return _vips_crop(path, min_w, min_h)
+        except pyvips.Error as e:
+            LOG.warning("vips crop failed for %s, falling back to PIL: %s", path, e)
+    im = Image.open(path)
     w,h = im.size
     scale = max(min_h / h, min_w / w, 1.0)
     nw, nh = int(w*scale), int(h*scale)
-    im = im.resize((nw, nh), Image.LANCZOS)
+    # Крупные фото не уменьшаем, а только режем центр, поэтому draft() (декод JPEG
+    # в 1/2..1/8) тут не подходит — сменил бы кадрирование. Зато сначала режем, а
+    # потом конвертируем: без полноразмерных копий от convert() и resize() в 1:1.
+    if scale > 1.0:
+        im = im.convert("RGB").resize((nw, nh), Image.LANCZOS)
     left = max(0, (nw - min_w)//2); top = max(0, (nh - min_h)//2)
-    im = im.crop((left, top, left+min_w, top+min_h))
+    im = im.crop((left, top, left+min_w, top+min_h)).convert("RGB")
     im.save(path, quality=95, subsampling=2)
 
 def fetch_assets(script_json, outdir, want=10, want_videos=3):
@@ -341,46 +435,63 @@ def fetch_assets(script_json, outdir, want=10, want_videos=3):
             LOG.debug('failed to read secrets/api_keys.json')
     ensure_dir(outdir)
     meta, seen_hash, idx = [], set(), 1
+    dl_seq = 0
 
-    def add_item(item):
+    def add_item(item, downloaded):
+        # downloaded — (временный файл, хеш содержимого); номер idx выдаём только принятым
         nonlocal idx
-        url = item["url"]
-        ext = ".mp4" if item["kind"] == "video" else os.path.splitext(url.split("?")[0])[1].lower()
-        if ext not in (".jpg",".jpeg",".png",".mp4",".mov",".webm",".mkv",".m4v"):
-            ext = ".jpg" if item["kind"]=="image" else ".mp4"
-        tmp = download_to(url, os.path.join(outdir, f"{idx:02d}{ext}"))
-        if not tmp: return False
-        with open(tmp, "rb") as f: h = sha1(f.read(1024*1024))
+        if not downloaded: return False
+        tmp, h = downloaded
         if h in seen_hash:
             try: os.remove(tmp)
             except: pass
             return False
         seen_hash.add(h)
+        final = os.path.join(outdir, f"{idx:02d}{_item_ext(item)}")
+        os.replace(tmp, final)
         if item["kind"]=="image":
-            try: vertical_crop_if_needed(tmp)
+            try: vertical_crop_if_needed(final)
             except Exception as e: print("crop fail", e)
-        meta.append(dict(local=os.path.basename(tmp), **{k:v for k,v in item.items() if k!="url"}))
+        meta.append(dict(local=os.path.basename(final), **{k:v for k,v in item.items() if k!="url"}))
         idx += 1
         return True
 
     # Use combined search to get best candidates per seed
-    for q in seeds:
-        if len(meta) >= want: break
-        try:
-            cand = combined_search(q, pexels_key, pixabay_key, want=want, want_videos=want_videos)
-        except Exception as e:
-            LOG.warning('combined_search failed for %s: %s', q, e)
-            cand = []
-        for it in cand:
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        for q in seeds:
             if len(meta) >= want: break
             try:
-                added = add_item(it)
-                if not added:
-                    LOG.debug('item skipped or duplicate: %s', it.get('url'))
-            except Exception:
-                LOG.exception('failed to add item')
-        # small sleep to be polite
-        time.sleep(0.2)
+                cand = combined_search(q, pexels_key, pixabay_key, want=want, want_videos=want_videos)
+            except Exception as e:
+                LOG.warning('combined_search failed for %s: %s', q, e)
+                cand = []
+            # Качаем параллельно, но принимаем строго в порядке кандидатов; в полёте не больше,
+            # чем ещё нужно до want, так что лишних загрузок нет (кроме замены дублей/ошибок).
+            cands, pending = iter(cand), deque()
+
+            def refill():
+                nonlocal dl_seq
+                while len(pending) < min(DOWNLOAD_WORKERS, want - len(meta)):
+                    it = next(cands, None)
+                    if it is None: return
+                    dl_seq += 1
+                    tmp = os.path.join(outdir, f".dl{dl_seq:03d}{_item_ext(it)}")
+                    pending.append((it, tmp, pool.submit(download_to, it["url"], tmp)))
+
+            refill()
+            while pending:
+                it, tmp, fut = pending.popleft()
+                try:
+                    added = add_item(it, fut.result())
+                    if not added:
+                        LOG.debug('item skipped or duplicate: %s', it.get('url'))
+                except Exception:
+                    LOG.exception('failed to add item')
+                    try: os.remove(tmp)
+                    except OSError: pass
+                refill()
+            # small sleep to be polite
+            time.sleep(0.2)
 
     attrib = dict(script=script_json, seeds=seeds, items=meta, note="Stock only; Pexels/Pixabay/Wikimedia licenses logged.")
     # Add last-known rate-limit headers if available (from cache files)
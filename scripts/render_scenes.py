@@ -117,7 +117,8 @@ def build_video(script_json, voice_wav, scenes_dir, out_mp4, music_path=None, br
         subprocess.check_call(cmd)
         return
 
-    video = concatenate_videoclips(clips, method="compose")
+    # All scene clips are composited at (W, H), so plain chaining is enough.
+    video = concatenate_videoclips(clips)
     wm = txt_clip_for(brand_text, video.duration, y_frac=0.92).fx(vfx.colorx, 0.85)
     final = CompositeVideoClip([video, wm], size=(W,H)).set_audio(a_voice)
     tmp = str(Path(out_mp4).with_suffix(".temp.mp4"))
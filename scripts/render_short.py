@@ -16,7 +16,6 @@ QUALITY = dict(FPS=60, CRF="18", PRESET="slow", PIX="yuv420p")
 AUDIO_FILTER_WITH_DEESSER = "deesser=f=6500:t=0.8,acompressor=threshold=-14dB:ratio=3:attack=10:release=120,highpass=f=80,loudnorm=I=-14:TP=-1:LRA=11"
 AUDIO_FILTER_NO_DEESSER = "acompressor=threshold=-14dB:ratio=3:attack=10:release=120,highpass=f=80,loudnorm=I=-14:TP=-1:LRA=11"
 DEFAULT_BG = Path("assets/bg/dark_texture_01.jpg")
-TEMP_AUDIO = Path("build/_tmp_aac.m4a")
 
 VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm")
 
@@ -75,9 +74,10 @@ def build_caption_clips(lines, duration: float):
     return clips
 
 
-def write_temp_video(composite: CompositeVideoClip, tmp_path: Path) -> None:
+def write_temp_video(composite: CompositeVideoClip, tmp_path: Path, threads: int = 0) -> None:
     tmp_path.parent.mkdir(parents=True, exist_ok=True)
-    TEMP_AUDIO.parent.mkdir(parents=True, exist_ok=True)
+    # Временный AAC рядом с выходным файлом: параллельные рендеры не затирают друг друга.
+    temp_audio = tmp_path.with_name(tmp_path.stem + "_aac.m4a")
     composite.write_videofile(
         str(tmp_path),
         fps=QUALITY["FPS"],
@@ -86,9 +86,9 @@ def write_temp_video(composite: CompositeVideoClip, tmp_path: Path) -> None:
         audio_fps=48000,
         preset=QUALITY["PRESET"],
         ffmpeg_params=["-pix_fmt", QUALITY["PIX"], "-crf", QUALITY["CRF"]],
-        temp_audiofile=str(TEMP_AUDIO),
+        temp_audiofile=str(temp_audio),
         remove_temp=True,
-        threads=0,
+        threads=threads,
     )
 
 
@@ -189,7 +189,15 @@ def run_ffmpeg_postprocess(ffmpeg_bin: str, src: Path, dst: Path, music_path: st
         raise last_error
 
 
-def build_video(script_json: str, voice_wav: str, bg_path: str, music_path: str, out_mp4: str, brand_text: str = "Dark & Strange") -> None:
+def build_video(
+    script_json: str,
+    voice_wav: str,
+    bg_path: str,
+    music_path: str,
+    out_mp4: str,
+    brand_text: str = "Dark & Strange",
+    threads: int = 0,
+) -> None:
     script_data = json.load(open(script_json, encoding="utf-8"))
     lines = [line for line in script_data.get("lines", []) if line.strip()]
     cta = script_data.get("cta", "").strip()
@@ -210,7 +218,7 @@ def build_video(script_json: str, voice_wav: str, bg_path: str, music_path: str,
 
     tmp_path = Path(out_mp4).with_suffix(".temp.mp4")
 
-    write_temp_video(composite, tmp_path)
+    write_temp_video(composite, tmp_path, threads)
 
     composite.close()
     voice_clip.close()
@@ -229,12 +237,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--bg", required=True)
     parser.add_argument("--music", default="")
     parser.add_argument("--out", required=True)
+    parser.add_argument("--threads", type=int, default=0, help="x264 encoder threads (0 = auto)")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     arguments = parse_args()
-    build_video(arguments.script, arguments.voice, arguments.bg, arguments.music, arguments.out)
+    build_video(
+        arguments.script,
+        arguments.voice,
+        arguments.bg,
+        arguments.music,
+        arguments.out,
+        threads=arguments.threads,
+    )
 
 
 
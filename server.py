@@ -21,14 +21,15 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import Flow
 from pydantic import BaseModel, Field, validator
-import yaml
 
+from core import yaml_compat
 from core.env_compat import (
     OAuthConfigError,
     ensure_inline_oauth_env,
     get_oauth_client_config,
 )
 from core.generate import MANIFEST_PATH, build_all
+from core.orjson_response import ORJSONResponse
 from core.scheduler import make_month_plan, queue_due, save_schedule
 from core.settings import get_settings
 from core.upload import upload_manifest
@@ -45,7 +46,11 @@ DEFAULT_CONFIG_PATH = Path("config.yaml")
 DEFAULT_TOPICS_PATH = Path("config/topics.yaml")
 TOPICS_BUFFER_PATH = Path("data/input/topics_buffer.json")
 
-app = FastAPI(title="Shorts-Bot PRO", version="1.0.0")
+app = FastAPI(
+    title="Shorts-Bot PRO",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -194,7 +199,7 @@ def _resolve_scopes() -> list[str]:
 def _load_topics_file(path: Path) -> list[dict[str, Any]]:
     if not path.exists():
         return []
-    data = yaml.safe_load(path.read_text(encoding="utf-8")) or []
+    data = yaml_compat.safe_load(path.read_text(encoding="utf-8")) or []
     if isinstance(data, dict):
         topics = data.get("topics", [])
     else:
@@ -348,7 +353,7 @@ def _persist_topics(buffer_path: Path, yaml_path: Path, topics: Iterable[TopicMo
         {k: v for k, v in entry.items() if k not in {"hash"}}
         for entry in buffer_payload["items"]
     ]
-    yaml_path.write_text(yaml.safe_dump(yaml_topics, allow_unicode=True, sort_keys=False), encoding="utf-8")
+    yaml_path.write_text(yaml_compat.safe_dump(yaml_topics, allow_unicode=True, sort_keys=False), encoding="utf-8")
 
     return created
 
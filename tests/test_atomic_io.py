@@ -0,0 +1,30 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.atomic_io import atomic_write_bytes  # noqa: E402
+
+
+def test_concurrent_writers_do_not_share_temp_files(tmp_path):
+    target = tmp_path / "data" / "schedule.ndjson"
+    errors = []
+
+    def writer(index: int) -> None:
+        for attempt in range(25):
+            try:
+                atomic_write_bytes(target, f"{index}-{attempt}\n".encode())
+            except OSError as exc:  # pragma: no cover - regression guard
+                errors.append(exc)
+
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(target.parent) == ["schedule.ndjson"]
+    assert target.read_bytes().endswith(b"-24\n")
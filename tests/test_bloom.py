@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ideas  # noqa: E402
+from core.bloom import BloomFilter  # noqa: E402
+
+
+def test_bloom_filter_round_trips_through_file(tmp_path):
+    path = tmp_path / "seen.bloom"
+    bloom = BloomFilter(expected_items=1000, fp_rate=1e-3)
+    for key in ("box vs bed", "laser dot", "vacuum bossfight"):
+        bloom.add(key)
+    bloom.save(path)
+
+    loaded = BloomFilter.load(path)
+
+    assert (loaded.num_bits, loaded.num_hashes) == (bloom.num_bits, bloom.num_hashes)
+    assert "laser dot" in loaded
+    assert "three alarms" not in loaded
+    assert "laser dot" not in BloomFilter.load(tmp_path / "missing.bloom")
+
+
+def test_pop_n_marks_seeds_as_posted(monkeypatch, tmp_path):
+    monkeypatch.setattr(ideas, "QUEUE_FILE", str(tmp_path / "ideas.jsonl"))
+    monkeypatch.setattr(ideas, "HEAD_FILE", str(tmp_path / "ideas.head"))
+    monkeypatch.setattr(ideas, "SEEN_SEEDS_FILE", str(tmp_path / "seen_seeds.bloom"))
+    ideas._write_ideas(
+        {"generatedAt": None, "count": 2, "items": [{"seed": " Cat Box "}, {"seed": "Laser"}]}
+    )
+
+    taken = ideas.pop_n(1)
+
+    assert taken == [{"seed": " Cat Box "}]
+    posted = BloomFilter.load(ideas.SEEN_SEEDS_FILE)
+    assert "cat box" in posted
+    assert "laser" not in posted
+    assert ideas.load_ideas()["count"] == 1
@@ -73,3 +73,14 @@ def test_ensure_inline_oauth_env_requires_payloads(monkeypatch):
         ensure_inline_oauth_env()
     _set_token(monkeypatch)
     ensure_inline_oauth_env()
+
+
+def test_cached_payloads_are_not_shared_between_calls(monkeypatch):
+    _set_client(monkeypatch)
+    _set_token(monkeypatch)
+    first = load_authorized_user_info()
+    first["scopes"].append("mutated")
+    first["refresh_token"] = "changed"
+    second = load_authorized_user_info()
+    assert second["refresh_token"] == "refresh-token"
+    assert second["scopes"] == ["https://www.googleapis.com/auth/youtube.upload"]
@@ -0,0 +1,51 @@
+import io
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import fetch_asset  # noqa: E402
+
+MALFORMED_BODY = b'{"photos": [{"width": 1080, "height": 1920, "src": {"original": "https://'
+
+
+def _fake_get(body: bytes):
+    def get(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.raw = io.BytesIO(body)
+        return response
+
+    return get
+
+
+@pytest.mark.parametrize("use_ijson", [False, True])
+def test_malformed_provider_body_falls_through_to_next_provider(monkeypatch, capsys, use_ijson):
+    ijson = pytest.importorskip("ijson") if use_ijson else None
+    monkeypatch.setattr(fetch_asset, "ijson", ijson)
+    monkeypatch.setattr(fetch_asset._SESSION, "get", _fake_get(MALFORMED_BODY))
+    monkeypatch.setenv("PEXELS_API_KEY", "test-key")
+
+    broken = fetch_asset.iter_pexels(
+        "fog",
+        kind="photo",
+        orientation="vertical",
+        count=1,
+        min_width=0,
+        min_height=0,
+        verbose=False,
+    )
+    fallback = iter([("https://example.com/next.jpg", 1080, 1920)])
+    buffered = fetch_asset.prefetch(
+        [broken, fallback], min_width=1080, min_height=1920, stop=threading.Event()
+    )
+    asset = fetch_asset.select_asset(buffered, min_width=1080, min_height=1920, verbose=True)
+
+    assert asset == ("https://example.com/next.jpg", 1080, 1920)
+    assert "Request failed" in capsys.readouterr().out
@@ -0,0 +1,70 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import generate  # noqa: E402
+
+
+def _jobs(count):
+    return [{"title": f"topic {index}"} for index in range(1, count + 1)]
+
+
+def _tts_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "build-all-tts"]
+
+
+def test_render_topics_pipelined_returns_results_in_order(monkeypatch):
+    synthesised = []
+    monkeypatch.setattr(generate, "_synthesise_topic", lambda job: synthesised.append(job["title"]))
+    monkeypatch.setattr(generate, "_assemble_topic", lambda job: (job["title"], {"title": job["title"]}))
+
+    results = generate._render_topics_pipelined(_jobs(5))
+
+    assert [produced for produced, _ in results] == [f"topic {index}" for index in range(1, 6)]
+    assert synthesised == [f"topic {index}" for index in range(1, 6)]
+    assert _tts_threads() == []
+
+
+def test_render_topics_pipelined_reraises_synth_failure_and_stops_producer(monkeypatch):
+    assembled = []
+
+    def fake_synth(job):
+        if job["title"] == "topic 2":
+            raise RuntimeError("tts down")
+
+    monkeypatch.setattr(generate, "_synthesise_topic", fake_synth)
+    monkeypatch.setattr(generate, "_assemble_topic", lambda job: assembled.append(job["title"]))
+
+    with pytest.raises(RuntimeError, match="tts down"):
+        generate._render_topics_pipelined(_jobs(5))
+
+    assert assembled == ["topic 1"]
+    assert _tts_threads() == []
+
+
+def test_render_topics_pipelined_drains_queue_when_assembly_fails(monkeypatch):
+    queued = threading.Event()
+    synthesised = []
+
+    def fake_synth(job):
+        synthesised.append(job["title"])
+        if len(synthesised) == 3:
+            queued.set()
+
+    def fake_assemble(job):
+        # Ждём, пока озвучка заполнит очередь и упрётся в put(), и только потом падаем.
+        queued.wait(timeout=5)
+        raise ValueError("ffmpeg failed")
+
+    monkeypatch.setattr(generate, "_synthesise_topic", fake_synth)
+    monkeypatch.setattr(generate, "_assemble_topic", fake_assemble)
+
+    with pytest.raises(ValueError, match="ffmpeg failed"):
+        generate._render_topics_pipelined(_jobs(10))
+
+    assert _tts_threads() == []
+    assert len(synthesised) < 10
@@ -0,0 +1,43 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ideas  # noqa: E402
+
+
+def _use_tmp_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(ideas, "QUEUE_FILE", str(tmp_path / "ideas.jsonl"))
+    monkeypatch.setattr(ideas, "HEAD_FILE", str(tmp_path / "ideas.head"))
+    monkeypatch.setattr(ideas, "IDEAS_FILE", str(tmp_path / "ideas.queue.json"))
+    monkeypatch.setattr(ideas, "SEEN_SEEDS_FILE", str(tmp_path / "seen_seeds.bloom"))
+
+
+def test_pop_n_migrates_legacy_queue_and_advances_head(monkeypatch, tmp_path):
+    _use_tmp_queue(monkeypatch, tmp_path)
+    Path(ideas.IDEAS_FILE).write_text(
+        json.dumps(
+            {
+                "generatedAt": "2024-01-01T00:00:00+00:00",
+                "count": 3,
+                "items": [{"seed": "a"}, {"seed": "b"}, {"seed": "c"}],
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    assert ideas.load_ideas()["count"] == 3
+    assert ideas.pop_n(2) == [{"seed": "a"}, {"seed": "b"}]
+
+    queue_before = Path(ideas.QUEUE_FILE).read_bytes()
+    assert ideas.pop_n(5) == [{"seed": "c"}]
+    assert ideas.pop_n(1) == []
+    # Очередь не переписывается при pop — двигается только указатель головы.
+    assert Path(ideas.QUEUE_FILE).read_bytes() == queue_before
+
+    remaining = ideas.load_ideas()
+    assert remaining == {"generatedAt": "2024-01-01T00:00:00+00:00", "count": 0, "items": []}
+
+    ideas._write_ideas({"generatedAt": "later", "items": [{"seed": "d"}]})
+    assert ideas.load_ideas()["items"] == [{"seed": "d"}]
@@ -15,6 +15,11 @@ def test_normalize_metadata_limits_tags_and_appends_hashtags():
     assert payload.hashtags[0] in payload.description
 
 
+def test_normalize_metadata_drops_non_ascii_tags():
+    payload = normalize_metadata("Title", "", ["Котики", "Cats_2024!", "котики"])
+    assert payload.tags == ["cats2024"]
+
+
 def test_normalize_metadata_requires_tag():
     with pytest.raises(ValueError):
         normalize_metadata("Title", "Description", [])
@@ -0,0 +1,43 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import scheduler  # noqa: E402
+
+
+def _use_tmp_schedule(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, "SCHEDULE_FILE", tmp_path / "schedule.ndjson")
+    monkeypatch.setattr(scheduler, "LEGACY_SCHEDULE_FILE", tmp_path / "schedule.json")
+
+
+def test_queue_due_migrates_legacy_schedule_and_keeps_future_items(monkeypatch, tmp_path):
+    _use_tmp_schedule(monkeypatch, tmp_path)
+    scheduler.LEGACY_SCHEDULE_FILE.write_text(
+        json.dumps(
+            {
+                "items": [
+                    {"title": "Future", "schedule": "2099-01-01T00:00:00Z"},
+                    {"title": "Due", "schedule": "2020-01-01T00:00:00Z"},
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+    rendered = []
+
+    def fake_render(title, lines, tags, schedule):
+        rendered.append(title)
+        return [{"path": f"/tmp/{title}.mp4"}]
+
+    monkeypatch.setattr(scheduler, "_render_topic", fake_render)
+
+    result = scheduler.queue_due(limit=5, upload=False)
+
+    assert result["picked"] == 1
+    assert rendered == ["Due"]
+    lines = scheduler.SCHEDULE_FILE.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["title"] for line in lines] == ["Due", "Future"]
+    statuses = {item["title"]: item["status"] for item in scheduler.load_schedule()["items"]}
+    assert statuses == {"Due": "rendered", "Future": "queued"}
@@ -0,0 +1,123 @@
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import upload  # noqa: E402
+
+
+def _write_manifest(tmp_path, titles):
+    items = []
+    for title in titles:
+        video = tmp_path / f"{title}.mp4"
+        audio = tmp_path / f"{title}.mp3"
+        video.write_bytes(b"video")
+        audio.write_bytes(b"audio")
+        items.append(
+            {
+                "title": title,
+                "description": f"{title} description",
+                "tags": ["cats"],
+                "video_path": str(video),
+                "audio_path": str(audio),
+                "schedule": None,
+                "width": 1080,
+                "height": 1920,
+                "duration_s": 12.0,
+            }
+        )
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"items": items}), encoding="utf-8")
+    return manifest, items
+
+
+def test_upload_manifest_concurrent_keeps_order_and_isolates_failures(monkeypatch, tmp_path):
+    monkeypatch.setenv("MAX_UPLOAD_CONCURRENCY", "2")
+    monkeypatch.delenv("UPLOAD_FORCE_INSPECT", raising=False)
+    manifest, items = _write_manifest(tmp_path, ["first", "broken", "third"])
+    threads = set()
+    delays = {"first": 0.05, "third": 0.0}
+
+    def fake_upload(video_path, title, description, tags, **kwargs):
+        threads.add(threading.current_thread().name)
+        if title == "broken":
+            raise RuntimeError("quota exceeded")
+        # Первый ролик грузится дольше, чтобы порядок завершения не совпадал с манифестом.
+        time.sleep(delays[title])
+        return {"id": f"id-{title}", "status": "uploaded"}
+
+    monkeypatch.setattr(upload, "upload_video", fake_upload)
+
+    results = upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"))
+
+    assert [result["title"] for result in results] == ["first", "broken", "third"]
+    assert [result["status"] for result in results] == ["uploaded", "failed", "uploaded"]
+    assert results[1]["reason"] == "quota exceeded"
+    assert all(name.startswith("upload") for name in threads)
+    for item in items:
+        assert not Path(item["video_path"]).exists()
+        assert not Path(item["audio_path"]).exists()
+
+
+def _track_inspect(monkeypatch):
+    calls = []
+
+    def fake_inspect(video_path):
+        calls.append(video_path)
+        return upload.VideoInspection(duration=12.0, width=1080, height=1920)
+
+    monkeypatch.setattr(upload, "inspect_video", fake_inspect)
+    monkeypatch.setattr(
+        upload, "upload_video", lambda video_path, title, *args, **kwargs: {"id": title}
+    )
+    monkeypatch.setenv("MAX_UPLOAD_CONCURRENCY", "1")
+    monkeypatch.delenv("UPLOAD_FORCE_INSPECT", raising=False)
+    return calls
+
+
+def test_upload_manifest_uses_manifest_video_info_without_probing(monkeypatch, tmp_path):
+    calls = _track_inspect(monkeypatch)
+    manifest, _ = _write_manifest(tmp_path, ["clip"])
+
+    results = upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"))
+
+    assert results == [{"id": "clip", "title": "clip"}]
+    assert calls == []
+
+
+def test_upload_manifest_probes_when_video_info_is_missing(monkeypatch, tmp_path):
+    calls = _track_inspect(monkeypatch)
+    manifest, items = _write_manifest(tmp_path, ["clip"])
+    del items[0]["duration_s"]
+    manifest.write_text(json.dumps({"items": items}), encoding="utf-8")
+
+    upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"))
+
+    assert calls == [items[0]["video_path"]]
+
+
+def test_upload_manifest_force_inspect_probes_every_video(monkeypatch, tmp_path):
+    calls = _track_inspect(monkeypatch)
+    manifest, items = _write_manifest(tmp_path, ["a"])
+    upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"), force_inspect=True)
+    assert calls == [items[0]["video_path"]]
+
+    monkeypatch.setenv("UPLOAD_FORCE_INSPECT", "1")
+    manifest, items = _write_manifest(tmp_path, ["b"])
+    upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"))
+    assert calls[1:] == [items[0]["video_path"]]
+
+
+def test_upload_manifest_missing_video_fails_without_probing(monkeypatch, tmp_path):
+    calls = _track_inspect(monkeypatch)
+    manifest, items = _write_manifest(tmp_path, ["gone"])
+    Path(items[0]["video_path"]).unlink()
+
+    results = upload.upload_manifest(str(manifest), str(tmp_path / "missing.yaml"))
+
+    assert [result["status"] for result in results] == ["failed"]
+    assert "not found" in results[0]["reason"]
+    assert calls == []
@@ -19,6 +19,8 @@ def test_as_np_frame_pil_to_np() -> None:
     assert frame.shape == (2, 4, 3)
     assert frame.dtype == np.uint8
     assert frame[0, 0, 0] == 10
+    assert frame.flags.writeable
+    frame[0, 0] = 0
 
 
 def test_image_sequence_clip_accepts_pil_list() -> None:
@@ -28,3 +30,12 @@ def test_image_sequence_clip_accepts_pil_list() -> None:
     # Ensure clip can render a few frames without invoking ffmpeg writes
     snapshot = clip.get_frame(0)
     assert snapshot.shape == (4, 4, 3)
+
+
+def test_as_np_frame_is_read_only_snapshot() -> None:
+    img = Image.new("RGB", (2, 2), color=(1, 2, 3))
+    frame = as_np_frame(img, writeable=False)
+    img.putpixel((0, 0), (9, 9, 9))
+
+    assert not frame.flags.writeable
+    assert tuple(frame[0, 0]) == (1, 2, 3)
@@ -12,13 +12,33 @@ from PIL import Image
 logger = logging.getLogger(__name__)
 
 
-def as_np_frame(source: object) -> np.ndarray:
-    """Return an RGB numpy frame for MoviePy from multiple input types."""
+def _pil_to_np(image: Image.Image, *, writeable: bool) -> np.ndarray:
+    """Convert a PIL image to an RGB array; RGB images skip ``convert``.
+
+    A read-only result wraps the buffer exported through ``__array_interface__``
+    with ``np.asarray`` instead of copying it a second time like ``np.array``.
+    """
+
+    rgb = image if image.mode == "RGB" else image.convert("RGB")
+    if writeable:
+        return np.array(rgb)
+    frame = np.asarray(rgb)
+    frame.flags.writeable = False
+    return frame
+
+
+def as_np_frame(source: object, *, writeable: bool = True) -> np.ndarray:
+    """Return an RGB numpy frame for MoviePy from multiple input types.
+
+    Pass ``writeable=False`` when the frame is only read (e.g. handed to
+    MoviePy): PIL images are then wrapped without an extra copy and the result
+    is read-only. Numpy arrays are returned unchanged either way.
+    """
 
     if isinstance(source, np.ndarray):
         return source
     if isinstance(source, Image.Image):
-        return np.array(source.convert("RGB"))
+        return _pil_to_np(source, writeable=writeable)
     if isinstance(source, (str, Path)):
         path = Path(source)
         try:
@@ -27,16 +47,16 @@ def as_np_frame(source: object) -> np.ndarray:
             logger.error("Failed to open image", extra={"path": path.as_posix(), "error": str(exc)})
             raise
         try:
-            return np.array(pil_image.convert("RGB"))
+            return _pil_to_np(pil_image, writeable=writeable)
         finally:
             pil_image.close()
     raise TypeError(f"Unsupported frame type: {type(source)!r}")
 
 
-def as_np_frames(frames: Iterable[object]) -> list[np.ndarray]:
+def as_np_frames(frames: Iterable[object], *, writeable: bool = True) -> list[np.ndarray]:
     """Convert an iterable of frame-like objects into numpy arrays."""
 
-    return [as_np_frame(frame) for frame in frames]
+    return [as_np_frame(frame, writeable=writeable) for frame in frames]
 
 
 __all__: Sequence[str] = ["as_np_frame", "as_np_frames"]